@@ -0,0 +1,141 @@
+"""Compare the native router with the serverless-wsgi + Flask path.
+
+Per-request overhead: both handlers get the same HTTP API v2 events, backed by
+an in-memory table, so only the adapter cost is measured. Cold start: a fresh
+interpreter imports each handler and serves one request, as a new Lambda
+container would during init and its first invoke.
+
+    pip install -r requirements.txt serverless-wsgi
+    python benchmarks/router_overhead.py --requests 20000 --cold-runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("REGION_NAME", "ap-south-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", os.environ["REGION_NAME"])
+os.environ.setdefault("TODO_TABLE", "todos-benchmark")
+os.environ.setdefault("TRUST_OWNER_HEADER", "true")
+
+
+class MemoryTable:
+    """Enough of the DynamoDB Table API for the views, without the network."""
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, Item, **kwargs):
+        self.items[(Item["owner"], Item["id"])] = dict(Item)
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get((Key["owner"], Key["id"]))
+        return {"Item": dict(item)} if item else {}
+
+    def query(self, Limit, **kwargs):
+        return {"Items": [dict(item) for item in list(self.items.values())[:Limit]]}
+
+
+def event(method, path, body=None, query=None):
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{k}={v}" for k, v in (query or {}).items()),
+        "queryStringParameters": query,
+        "headers": {"content-type": "application/json", "host": "localhost", "x-owner-id": "benchmark"},
+        "requestContext": {
+            "stage": "$default",
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "benchmark"},
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def load_handlers(wsgi=True):
+    import todos
+    import router
+    todos.table = MemoryTable()
+    handlers = {"router": router.handler}
+    if not wsgi:
+        return todos, handlers
+    try:
+        import serverless_wsgi
+        from app import app
+    except ImportError:
+        print("serverless-wsgi not installed; only timing the router")
+    else:
+        handlers["wsgi"] = lambda e, c: serverless_wsgi.handle_request(app, e, c)
+    return todos, handlers
+
+
+def per_request(handlers, todos, requests):
+    created = handlers["router"](event("POST", "/todos", {"todo": "benchmark"}), None)
+    todo_id = json.loads(created["body"])["id"]
+    for i in range(99):
+        todos.create_todo("benchmark", {}, {"todo": f"todo {i}"})
+    cases = {
+        "get": event("GET", f"/todos/{todo_id}"),
+        "list": event("GET", "/todos/list", query={"limit": "20"}),
+        "create": event("POST", "/todos", {"todo": "benchmark"}),
+    }
+    results = {}
+    for name, handler in handlers.items():
+        for case, e in cases.items():
+            handler(e, None)  # warm any lazy imports
+            start = time.perf_counter()
+            for _ in range(requests):
+                handler(e, None)
+            results[f"{name}/{case}"] = (time.perf_counter() - start) / requests * 1e6
+    return results
+
+
+COLD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import benchmarks.router_overhead as bench
+todos, handlers = bench.load_handlers(wsgi={name!r} == "wsgi")
+handler = handlers[{name!r}]
+imported = time.perf_counter()
+handler(bench.event("POST", "/todos", {{"todo": "cold"}}), None)
+done = time.perf_counter()
+print(json.dumps({{"init_ms": (imported - start) * 1e3, "first_request_ms": (done - imported) * 1e3}}))
+"""
+
+
+def cold_start(name, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", COLD_SCRIPT.format(name=name)],
+            cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--cold-runs", type=int, default=5)
+    args = parser.parse_args()
+
+    todos, handlers = load_handlers()
+    print(f"per-request overhead (us, {args.requests} requests)")
+    for case, us in per_request(handlers, todos, args.requests).items():
+        print(f"  {case:<14}{us:>10.1f}")
+
+    print(f"cold start (ms, median of {args.cold_runs} fresh interpreters)")
+    for name in handlers:
+        result = cold_start(name, args.cold_runs)
+        print(f"  {name:<8}init {result['init_ms']:>8.1f}   first request {result['first_request_ms']:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+
+# ULID todo ids: 48-bit millisecond timestamp + 80 random bits, written as 26
+# Crockford base32 characters so string order is creation order. Within one
+# container ids are strictly increasing even inside the same millisecond (the
+# random part is incremented), so a Query on the table's sort key is already
+# newest/oldest first and a LastEvaluatedKey is a stable cursor.
+
+ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ENCODING[digit])
+    return "".join(reversed(chars))
+
+
+def id_from_timestamp(timestamp_ms):
+    """A ULID for a given time, with no monotonic guarantee (for backfills)."""
+    return encode(timestamp_ms, 10) + encode(int.from_bytes(os.urandom(10), "big"), 16)
+
+
+def new_id():
+    global _last_ms, _last_random
+    with _lock:
+        now = int(time.time() * 1000)
+        if now > _last_ms:
+            _last_ms, _last_random = now, int.from_bytes(os.urandom(10), "big")
+        else:
+            # Same millisecond, or the clock stepped back: stay on the last
+            # timestamp and count up. The random part may start close to
+            # 2**80, so it can run out; the spec says fail rather than wrap.
+            if _last_random >= 2 ** RANDOM_BITS - 1:
+                raise OverflowError("ULID random part exhausted for this millisecond")
+            _last_random += 1
+        return encode(_last_ms, 10) + encode(_last_random, 16)
+
+
+def is_ulid(value):
+    return len(value) == 26 and all(c in ENCODING for c in value)
+
+
+def timestamp_of(value):
+    """Creation time in epoch ms of a ULID."""
+    result = 0
+    for c in value[:10]:
+        result = result * 32 + ENCODING.index(c)
+    return result
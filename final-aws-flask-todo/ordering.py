@@ -0,0 +1,60 @@
+# Fractional-index order keys. A key is a string of base-62 digits (ASCII
+# order) read as a fraction 0.d1d2d3..., so string comparison is numeric
+# comparison and there is always another key between two neighbours: moving a
+# todo rewrites only that todo's key. Keys never end in "0", which keeps room
+# below every key. Repeated inserts at the same spot lengthen keys, so
+# spread() hands out fresh, short, evenly spaced keys for a rebalance.
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+
+def validate(key):
+    if not key or key[-1] == DIGITS[0] or any(c not in DIGITS for c in key):
+        raise ValueError(f"invalid order key {key!r}")
+
+
+def _midpoint(a, b):
+    """A key strictly between a and b; a may be "" (start), b None (end)."""
+    if b is not None:
+        # Shared prefix (a padded with zeros): recurse past it
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    low = DIGITS.index(a[0]) if a else 0
+    high = DIGITS.index(b[0]) if b is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high) // 2]
+    # Adjacent first digits
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[low] + _midpoint(a[1:], None)
+
+
+def key_between(low, high):
+    """Order key sorting after `low` and before `high` (None for either end)."""
+    if low is not None:
+        validate(low)
+    if high is not None:
+        validate(high)
+    if low is not None and high is not None and low >= high:
+        raise ValueError(f"{low!r} does not sort before {high!r}")
+    return _midpoint(low or "", high)
+
+
+def spread(count):
+    """`count` ascending keys of equal (minimal) width, evenly spaced."""
+    width = 1
+    while BASE ** width <= 2 * count:
+        width += 1
+    keys = []
+    for i in range(1, count + 1):
+        value = i * BASE ** width // (count + 1)
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip(DIGITS[0]))
+    return keys
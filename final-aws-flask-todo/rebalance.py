@@ -0,0 +1,51 @@
+from boto3.dynamodb.conditions import Attr, Key
+
+import ordering
+import todos
+
+# Async Lambda (invoked by todos.request_rebalance) that gives every live todo
+# of one owner a fresh, short, evenly spaced order key, keeping the current
+# manual order. Todos without a key (created before ordering existed) are
+# placed after the ordered ones, oldest first.
+
+
+def owner_todos(owner):
+    ordered, unordered = [], []
+    for items, kwargs in (
+        (ordered, {"IndexName": todos.OWNER_ORDER_INDEX}),
+        (unordered, {"FilterExpression": Attr("orderKey").not_exists() & Attr("deletedAt").not_exists()}),
+    ):
+        kwargs["KeyConditionExpression"] = Key("owner").eq(owner)
+        while True:
+            resp = todos.table.query(**kwargs)
+            items.extend(resp["Items"])
+            if "LastEvaluatedKey" not in resp:
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    return ordered + unordered
+
+
+def rebalance(owner):
+    items = owner_todos(owner)
+    rewritten = skipped = 0
+    for item, order_key in zip(items, ordering.spread(len(items))):
+        if item.get("orderKey") == order_key:
+            continue
+        params = todos.todo_update(owner, item["id"], {}, order_key=order_key)
+        # Leave todos that were moved or deleted meanwhile alone
+        if "orderKey" in item:
+            params["ConditionExpression"] += " AND orderKey = :previousOrderKey"
+            params["ExpressionAttributeValues"][":previousOrderKey"] = item["orderKey"]
+        else:
+            params["ConditionExpression"] += " AND attribute_not_exists(orderKey)"
+        try:
+            todos.table.update_item(**params)
+            rewritten += 1
+        except todos.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            skipped += 1
+    print(f"Rebalanced {owner}: {len(items)} todos, {rewritten} rewritten, {skipped} changed meanwhile")
+    return {"todos": len(items), "rewritten": rewritten, "skipped": skipped}
+
+
+def handler(event, context):
+    return rebalance(event["owner"])
@@ -0,0 +1,95 @@
+import datetime
+import json
+import os
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import BotoCoreError, ClientError
+
+import todos
+
+# Scheduled sweeper: every SWEEP_INTERVAL it emits a "Todo reminder" event to
+# EventBridge for each unchecked todo due in the next window. It queries only
+# the dueBucket partitions (UTC hours) that the window touches, so its cost
+# follows the number of todos due, not the size of the table.
+#
+# Windows are aligned to the schedule's own time, [t + LEAD, t + LEAD +
+# SWEEP_INTERVAL), so consecutive runs cover every second exactly once.
+
+SWEEP_INTERVAL = int(os.environ.get("REMINDER_SWEEP_SECONDS", "300"))
+LEAD = int(os.environ.get("REMINDER_LEAD_SECONDS", "900"))
+EVENT_BUS = os.environ.get("REMINDER_EVENT_BUS", "default")
+EVENT_SOURCE = "todos.reminders"
+PUT_EVENTS_BATCH = 10  # PutEvents limit
+
+events = boto3.client("events")
+
+
+def due_todos(start, end):
+    """Unchecked todos with start <= dueAt < end."""
+    items = []
+    for bucket in sorted({todos.due_bucket(start), todos.due_bucket(end - 1)}):
+        kwargs = {
+            "IndexName": todos.DUE_BUCKET_INDEX,
+            "KeyConditionExpression": Key("dueBucket").eq(bucket) & Key("dueAt").between(start, end - 1),
+            "FilterExpression": Attr("checked").eq(False),
+        }
+        while True:
+            resp = todos.table.query(**kwargs)
+            items.extend(resp["Items"])
+            if "LastEvaluatedKey" not in resp:
+                break
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+    return items
+
+
+def reminder_entry(item):
+    return {
+        "Source": EVENT_SOURCE,
+        "DetailType": "Todo reminder",
+        "EventBusName": EVENT_BUS,
+        "Detail": json.dumps({
+            "owner": item["owner"],
+            "id": item["id"],
+            "todo": item.get("todo"),
+            "dueAt": item["dueAt"],
+        }, default=todos.json_default),
+    }
+
+
+def put_events(entries):
+    """Send entries 10 at a time, retrying failed entries once; returns the failures.
+
+    A failed call is logged, not raised: an invocation error would make
+    Lambda retry the whole window and re-send the reminders already delivered.
+    """
+    failed = []
+    for i in range(0, len(entries), PUT_EVENTS_BATCH):
+        batch = entries[i:i + PUT_EVENTS_BATCH]
+        for attempt in range(2):
+            try:
+                resp = events.put_events(Entries=batch)
+            except (BotoCoreError, ClientError) as e:
+                print(f"PutEvents failed for {len(batch)} reminders: {e}")
+                failed.extend(batch)
+                break
+            if not resp.get("FailedEntryCount"):
+                break
+            # Results line up with the entries; failed ones carry an ErrorCode
+            batch = [entry for entry, result in zip(batch, resp["Entries"]) if "ErrorCode" in result]
+        else:
+            failed.extend(batch)
+    return failed
+
+
+def sweep(event, context):
+    scheduled = datetime.datetime.strptime(event["time"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=datetime.timezone.utc)
+    start = int(scheduled.timestamp()) // SWEEP_INTERVAL * SWEEP_INTERVAL + LEAD
+    end = start + SWEEP_INTERVAL
+
+    items = due_todos(start, end)
+    failed = put_events([reminder_entry(item) for item in items])
+    for entry in failed:
+        print(f"Reminder not delivered: {entry['Detail']}")
+    print(f"Reminders for [{start}, {end}): {len(items)} due, {len(failed)} failed")
+    return {"due": len(items), "failed": len(failed)}
@@ -0,0 +1,72 @@
+import base64
+import json
+import re
+from urllib.parse import unquote
+
+import todos
+import warmup
+
+# Native HTTP API (payload format 2.0) handler for the todo views. Routes are
+# matched straight from the event's method and rawPath - no WSGI environ,
+# Werkzeug request/response or Flask app context is built per request.
+
+ROUTES = [
+    (method, re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$"), view, reads_body)
+    for method, path, view, reads_body in todos.ROUTES
+]
+
+
+def response(payload, status):
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(payload, default=todos.json_default),
+    }
+
+
+def match(method, path):
+    """Return (view, reads_body, path params), or a (payload, status) error."""
+    allowed = False
+    for route_method, pattern, view, reads_body in ROUTES:
+        found = pattern.match(path)
+        if not found:
+            continue
+        if route_method == method:
+            return (view, reads_body, {k: unquote(v) for k, v in found.groupdict().items()}), None
+        allowed = True
+    if allowed:
+        return None, ({"error": "Method Not Allowed"}, 405)
+    return None, ({"error": "Not Found"}, 404)
+
+
+def decode_body(event):
+    body = event.get("body")
+    if not body:
+        raise ValueError("empty body")
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+    return json.loads(body)
+
+
+@warmup.time_first_call
+def handler(event, context):
+    http = event["requestContext"]["http"]
+    route, error = match(http["method"], event.get("rawPath") or http["path"])
+    if error:
+        return response(*error)
+    view, reads_body, params = route
+
+    data = None
+    if reads_body:
+        try:
+            data = decode_body(event)
+        except ValueError:
+            return response({"error": "Invalid JSON body"}, 400)
+
+    # HTTP API lower-cases header names; it has already URL-decoded the
+    # query string, joining repeated keys with commas.
+    owner = todos.event_owner(event, event.get("headers") or {})
+    return response(*todos.dispatch(view, owner, event.get("queryStringParameters") or {}, data, params))
+
+
+warmup.run()
@@ -0,0 +1,62 @@
+"""Copy todos from the id-keyed table into the owner-partitioned table.
+
+Runs while the API is live: items are written with attribute_not_exists, so a
+todo that already exists in the new table (created or copied earlier) is never
+overwritten, and the script can be re-run until it reports nothing copied.
+The old table had no owner, so every legacy todo is assigned --owner.
+
+    python scripts/migrate_to_owner_table.py --source todos-table-dev \\
+        --target todos-by-owner-dev --owner <sub of the owning user> --segments 8
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import boto3
+
+dynamodb = boto3.resource("dynamodb")
+
+
+def migrate_segment(source, target, owner, segment, total_segments):
+    copied = skipped = 0
+    kwargs = {"Segment": segment, "TotalSegments": total_segments}
+    while True:
+        resp = source.scan(**kwargs)
+        for item in resp["Items"]:
+            item.pop("checkedState", None)
+            item["owner"] = item.get("owner") or owner
+            item["ownerCheckedState"] = f"{item['owner']}#{'checked' if item.get('checked') else 'unchecked'}"
+            # Index the todo for /todos/changes; updatedAt used to be an ISO string
+            item.setdefault("changedAt", int(item["createdAt"]) * 1000)
+            item.setdefault("version", 1)
+            if not isinstance(item.get("updatedAt"), Decimal):
+                item["updatedAt"] = item["createdAt"]
+            try:
+                target.put_item(Item=item, ConditionExpression="attribute_not_exists(id)")
+                copied += 1
+            except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+                skipped += 1
+        if "LastEvaluatedKey" not in resp:
+            return copied, skipped
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--target", required=True)
+    parser.add_argument("--owner", required=True, help="owner assigned to todos that have none")
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments")
+    args = parser.parse_args()
+
+    source, target = dynamodb.Table(args.source), dynamodb.Table(args.target)
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        results = list(pool.map(
+            lambda segment: migrate_segment(source, target, args.owner, segment, args.segments),
+            range(args.segments),
+        ))
+    print(f"Copied {sum(r[0] for r in results)} todos, {sum(r[1] for r in results)} already present")
+
+
+if __name__ == "__main__":
+    main()
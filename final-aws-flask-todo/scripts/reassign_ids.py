@@ -0,0 +1,88 @@
+"""Give todos created before ULID ids a time-ordered id.
+
+Listing reads the table in id order, so old uuid1 ids would sort apart from
+the new ones. Each legacy todo is copied to a ULID taken from its createdAt,
+with `previousId` pointing at the old id, and the old item becomes a
+tombstone. Both happen in one transaction, so a delta-syncing client sees the
+old id deleted and the new one created.
+Re-running skips todos that were already moved.
+
+    python scripts/reassign_ids.py --table todos-by-owner-dev --segments 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ids  # noqa: E402
+
+TOMBSTONE_TTL = 30 * 24 * 3600  # todos.TOMBSTONE_TTL
+
+dynamodb = boto3.resource("dynamodb")
+
+
+def reassign(table_name, item):
+    changed_at = int(time.time() * 1000)
+    new_item = dict(item, id=ids.id_from_timestamp(int(item["createdAt"]) * 1000),
+                    previousId=item["id"], changedAt=changed_at, version=1)
+    dynamodb.meta.client.transact_write_items(TransactItems=[
+        {"Put": {"TableName": table_name, "Item": new_item, "ConditionExpression": "attribute_not_exists(id)"}},
+        {"Update": {
+            "TableName": table_name,
+            "Key": {"owner": item["owner"], "id": item["id"]},
+            "ExpressionAttributeNames": {"#todo_text": "todo"},
+            "ExpressionAttributeValues": {
+                ":deletedAt": changed_at // 1000,
+                ":changedAt": changed_at,
+                ":expiresAt": changed_at // 1000 + TOMBSTONE_TTL,
+                ":one": 1,
+                ":zero": 0,
+            },
+            "UpdateExpression": (
+                "SET deletedAt = :deletedAt, changedAt = :changedAt, expiresAt = :expiresAt,"
+                " version = if_not_exists(version, :zero) + :one"
+                " REMOVE #todo_text, checked, ownerCheckedState, orderKey, dueAt, dueBucket, createdAt, updatedAt"
+            ),
+            "ConditionExpression": "attribute_exists(id) AND attribute_not_exists(deletedAt)",
+        }},
+    ])
+
+
+def reassign_segment(table, segment, total_segments):
+    moved = failed = 0
+    kwargs = {"Segment": segment, "TotalSegments": total_segments}
+    while True:
+        resp = table.scan(**kwargs)
+        for item in resp["Items"]:
+            if ids.is_ulid(item["id"]) or "deletedAt" in item:
+                continue
+            try:
+                reassign(table.name, item)
+                moved += 1
+            except dynamodb.meta.client.exceptions.TransactionCanceledException as e:
+                # Changed or deleted since the scan; a re-run picks it up
+                print(f"Skipped {item['owner']}/{item['id']}: {e}")
+                failed += 1
+        if "LastEvaluatedKey" not in resp:
+            return moved, failed
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments")
+    args = parser.parse_args()
+
+    table = dynamodb.Table(args.table)
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        results = list(pool.map(lambda segment: reassign_segment(table, segment, args.segments), range(args.segments)))
+    print(f"Moved {sum(r[0] for r in results)} todos to ULID ids, {sum(r[1] for r in results)} skipped")
+
+
+if __name__ == "__main__":
+    main()
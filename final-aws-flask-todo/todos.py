@@ -0,0 +1,515 @@
+import os
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+import time, threading
+import base64, json
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import ids
+import ordering
+
+# View logic shared by the Flask app (app.py, local `sls wsgi serve`) and the
+# native HTTP API router (router.py, deployed). Views take the caller's owner,
+# the query-string dict, the decoded JSON body and the path parameters, and
+# return (payload, status) - nothing here knows about Flask or Lambda events.
+
+region = os.environ["REGION_NAME"]
+dynamodb = boto3.resource("dynamodb")
+table = dynamodb.Table(os.environ["TODO_TABLE"])
+
+# Todos are partitioned by owner (table key: owner + id). Ids are ULIDs (see
+# ids.py), so the table's own sort order is creation order and the full list
+# needs no index. The checked filter uses a GSI on createdAt; DynamoDB can't
+# index the BOOL `checked`, so writes mirror it into the string
+# `ownerCheckedState` ("<owner>#checked").
+OWNER_CHECKED_INDEX = "OwnerCheckedCreatedAtIndex"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# TransactWriteItems takes at most 100 actions, which also bounds a non-atomic
+# bulk request so it fits in one invocation
+MAX_BULK_UPDATES = 100
+BULK_WORKERS = 10
+
+# Manual order: each todo carries a fractional `orderKey` (see ordering.py)
+# and OwnerOrderIndex on owner + orderKey lists them in that order. New todos
+# go to the end. Once a key grows past MAX_ORDER_KEY_LENGTH the rebalancer
+# function is invoked asynchronously to respace the owner's keys.
+OWNER_ORDER_INDEX = "OwnerOrderIndex"
+MAX_ORDER_KEY_LENGTH = 24
+REBALANCE_FUNCTION = os.environ.get("REBALANCE_FUNCTION")
+_lambda_client = None
+
+# Optional due dates (`dueAt`, epoch seconds). Todos with one also carry
+# `dueBucket`, the UTC hour it falls in ("2026-01-31T09"), so DueBucketIndex on
+# dueBucket + dueAt is sparse and reminders.py reads one hour's partition
+# instead of scanning the table.
+DUE_BUCKET_INDEX = "DueBucketIndex"
+
+# Every write stamps `changedAt` (epoch ms, never repeating or going backwards
+# within a container) and bumps `version`; OwnerChangedAtIndex on owner +
+# changedAt serves /todos/changes. Deletes leave a tombstone that expires
+# after TOMBSTONE_TTL. Clocks differ between containers and a write stamped
+# just before a read may land after it, so each sync re-reads the last
+# CHANGE_OVERLAP_MS; clients drop repeats by comparing versions.
+OWNER_CHANGED_INDEX = "OwnerChangedAtIndex"
+CHANGE_OVERLAP_MS = 5000
+TOMBSTONE_TTL = 30 * 24 * 3600
+
+_change_lock = threading.Lock()
+_last_change_ms = 0
+
+# Owner comes from the JWT authorizer's `sub` claim. Clients can set any
+# header, so the owner header is only read when TRUST_OWNER_HEADER=true (local
+# `sls wsgi serve`, or behind a caller that sets it itself).
+OWNER_HEADER = os.environ.get("OWNER_HEADER", "X-Owner-Id")
+TRUST_OWNER_HEADER = os.environ.get("TRUST_OWNER_HEADER", "false").lower() == "true"
+
+
+def owner_checked_state(owner, checked):
+    return f"{owner}#{'checked' if checked else 'unchecked'}"
+
+
+def next_change_ms():
+    global _last_change_ms
+    with _change_lock:
+        _last_change_ms = max(int(time.time() * 1000), _last_change_ms + 1)
+        return _last_change_ms
+
+
+def due_bucket(due_at):
+    return time.strftime("%Y-%m-%dT%H", time.gmtime(due_at))
+
+
+def valid_due_at(value, allow_none=False):
+    if value is None:
+        return allow_none
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < 2 ** 40
+
+
+def event_owner(event, headers):
+    """Owner of an HTTP API v2 event; headers must accept lower-case lookups."""
+    authorizer = (event or {}).get("requestContext", {}).get("authorizer") or {}
+    claims = authorizer.get("jwt", {}).get("claims", {})
+    if claims.get("sub"):
+        return claims["sub"]
+    return headers.get(OWNER_HEADER.lower()) if TRUST_OWNER_HEADER else None
+
+
+def json_default(value):
+    # DynamoDB returns numbers as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, default=int).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def cursor_attributes(index_name):
+    """Attributes (and types) of a LastEvaluatedKey from the table or an index."""
+    attributes = {"owner": str, "id": str}
+    if index_name == OWNER_CHECKED_INDEX:
+        attributes.update(ownerCheckedState=str, createdAt=int)
+    elif index_name == OWNER_ORDER_INDEX:
+        attributes.update(orderKey=str)
+    elif index_name == OWNER_CHANGED_INDEX:
+        attributes.update(changedAt=int)
+    return attributes
+
+
+def decode_cursor(cursor, owner, index_name=None):
+    """ExclusiveStartKey from a cursor; raises ValueError unless it is one of
+    this owner's keys for the table or index being queried."""
+    if not cursor:
+        return None
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    key = json.loads(raw)
+    attributes = cursor_attributes(index_name)
+    if not isinstance(key, dict) or key.keys() != attributes.keys():
+        raise ValueError("cursor is not a key")
+    if any(type(key[name]) is not kind for name, kind in attributes.items()) or key["owner"] != owner:
+        raise ValueError("cursor is not a key")
+    return key
+
+
+def last_order_key(owner):
+    resp = table.query(
+        IndexName=OWNER_ORDER_INDEX,
+        KeyConditionExpression=Key("owner").eq(owner),
+        ScanIndexForward=False,
+        Limit=1,
+    )
+    return resp["Items"][0]["orderKey"] if resp["Items"] else None
+
+
+def request_rebalance(owner):
+    global _lambda_client
+    if not REBALANCE_FUNCTION:
+        print(f"Order keys for {owner} need rebalancing; REBALANCE_FUNCTION is not set")
+        return
+    if _lambda_client is None:
+        _lambda_client = boto3.client("lambda")
+    try:
+        _lambda_client.invoke(
+            FunctionName=REBALANCE_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps({"owner": owner}).encode(),
+        )
+    except Exception as e:
+        # The next long key asks again
+        print(f"Rebalance request failed: {e}")
+
+
+def create_todo(owner, query, data):
+    if not isinstance(data, dict) or not isinstance(data.get("todo"), str) or not valid_due_at(data.get("dueAt"), allow_none=True):
+        return {"error": "Validation Failed"}, 400
+
+    changed_at = next_change_ms()
+    timestamp = changed_at // 1000
+    todo_id = ids.new_id()
+    order_key = ordering.key_between(last_order_key(owner), None)
+
+    item = {
+        "owner": owner,
+        "id": todo_id,
+        "todo": data["todo"],
+        "checked": False,
+        "ownerCheckedState": owner_checked_state(owner, False),
+        "createdAt": timestamp,
+        "updatedAt": timestamp,
+        "changedAt": changed_at,
+        "version": 1,
+        "orderKey": order_key,
+    }
+    if data.get("dueAt") is not None:
+        item["dueAt"] = data["dueAt"]
+        item["dueBucket"] = due_bucket(data["dueAt"])
+
+    table.put_item(Item=item)
+    if len(order_key) > MAX_ORDER_KEY_LENGTH:
+        request_rebalance(owner)
+    return item, 201
+
+
+def list_todos(owner, query, data):
+    checked = query.get("checked")
+    order = query.get("order", "created")
+    try:
+        limit = int(query.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return {"error": "Invalid limit"}, 400
+    if not 1 <= limit <= MAX_PAGE_SIZE or checked not in (None, "true", "false"):
+        return {"error": f"limit must be 1-{MAX_PAGE_SIZE} and checked true or false"}, 400
+    if order not in ("created", "manual") or (order == "manual" and checked is not None):
+        return {"error": "order must be created or manual, and manual can't be combined with checked"}, 400
+    index_name = OWNER_ORDER_INDEX if order == "manual" else None if checked is None else OWNER_CHECKED_INDEX
+    try:
+        start_key = decode_cursor(query.get("cursor"), owner, index_name)
+        if start_key and index_name == OWNER_CHECKED_INDEX and \
+                start_key["ownerCheckedState"] != owner_checked_state(owner, checked == "true"):
+            raise ValueError("cursor is from another filter")
+    except ValueError:
+        return {"error": "Invalid cursor"}, 400
+
+    # Newest first, reading only the rows on this page of this owner's todos
+    kwargs = {"Limit": limit, "ScanIndexForward": False}
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+
+    if order == "manual":
+        kwargs["ScanIndexForward"] = True
+        resp = table.query(
+            IndexName=OWNER_ORDER_INDEX,
+            KeyConditionExpression=Key("owner").eq(owner),
+            **kwargs
+        )
+    elif checked is None:
+        # Tombstones share the partition; a page can come back short, but the
+        # cursor still moves past them
+        resp = table.query(
+            KeyConditionExpression=Key("owner").eq(owner),
+            FilterExpression=Attr("deletedAt").not_exists(),
+            **kwargs
+        )
+    else:
+        resp = table.query(
+            IndexName=OWNER_CHECKED_INDEX,
+            KeyConditionExpression=Key("ownerCheckedState").eq(owner_checked_state(owner, checked == "true")),
+            **kwargs
+        )
+    return {"items": resp["Items"], "cursor": encode_cursor(resp.get("LastEvaluatedKey"))}, 200
+
+
+def get_todo(owner, query, data, id):
+    try:
+        resp = table.get_item(Key={"owner": owner, "id": id})
+    except Exception as e:
+        print(e)
+        return {"error": "Internal Server Error"}, 500
+
+    item = resp.get("Item")
+    if item and "deletedAt" not in item:
+        return item, 200
+    else:
+        return {"error": "Todo not found"}, 404
+
+
+# Writes only touch live todos: not another owner's id, and not a tombstone
+LIVE_TODO = "attribute_exists(id) AND attribute_not_exists(deletedAt)"
+
+
+def todo_update(owner, id, changes, order_key=None):
+    """update_item parameters applying `changes` (todo, checked and/or dueAt) and/or a new order key."""
+    changed_at = next_change_ms()
+    names = {}
+    values = {":updatedAt": changed_at // 1000, ":changedAt": changed_at, ":one": 1, ":zero": 0}
+    sets = []
+    removes = []
+    if "todo" in changes:
+        names["#todo_text"] = "todo"
+        values[":todo"] = changes["todo"]
+        sets.append("#todo_text = :todo")
+    if "checked" in changes:
+        values[":checked"] = changes["checked"]
+        values[":ownerCheckedState"] = owner_checked_state(owner, changes["checked"])
+        sets += ["checked = :checked", "ownerCheckedState = :ownerCheckedState"]
+    if "dueAt" in changes:
+        if changes["dueAt"] is None:
+            removes += ["dueAt", "dueBucket"]
+        else:
+            values[":dueAt"] = changes["dueAt"]
+            values[":dueBucket"] = due_bucket(changes["dueAt"])
+            sets += ["dueAt = :dueAt", "dueBucket = :dueBucket"]
+    if order_key is not None:
+        values[":orderKey"] = order_key
+        sets.append("orderKey = :orderKey")
+    expression = "SET " + ", ".join(sets + [
+        "updatedAt = :updatedAt", "changedAt = :changedAt", "version = if_not_exists(version, :zero) + :one",
+    ])
+    if removes:
+        expression += " REMOVE " + ", ".join(removes)
+    params = {
+        "Key": {"owner": owner, "id": id},
+        "ExpressionAttributeValues": values,
+        "UpdateExpression": expression,
+        "ConditionExpression": LIVE_TODO,
+    }
+    if names:
+        params["ExpressionAttributeNames"] = names
+    return params
+
+
+def update_todo(owner, query, data, id):
+    # Validation
+    if (
+        not isinstance(data, dict) or not isinstance(data.get("todo"), str) or not isinstance(data.get("checked"), bool)
+        or not valid_due_at(data.get("dueAt"), allow_none=True)
+    ):
+        print("Value of todo, checked or dueAt is invalid")
+        return {"error": "Invalid input"}, 400
+
+    try:
+        resp = table.update_item(ReturnValues="ALL_NEW", **todo_update(owner, id, data))
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return {"error": "Todo not found"}, 404
+    except Exception as e:
+        print(e)
+        return {"error": "Internal Server Error"}, 500
+
+    return resp.get("Attributes"), 200
+
+
+def validate_bulk(data):
+    """Return the list of updates in a bulk request, or an error message."""
+    if not isinstance(data, dict) or not isinstance(data.get("updates"), list) or not isinstance(data.get("atomic", False), bool):
+        return None, "Body must be {\"updates\": [...], \"atomic\": bool}"
+    updates = data["updates"]
+    if not 1 <= len(updates) <= MAX_BULK_UPDATES:
+        return None, f"Between 1 and {MAX_BULK_UPDATES} updates are allowed"
+    for update in updates:
+        if (
+            not isinstance(update, dict) or not isinstance(update.get("id"), str)
+            or not ("todo" in update or "checked" in update or "dueAt" in update)
+            or ("todo" in update and not isinstance(update["todo"], str))
+            or ("checked" in update and not isinstance(update["checked"], bool))
+            or ("dueAt" in update and not valid_due_at(update["dueAt"], allow_none=True))
+        ):
+            return None, "Each update needs an id and a string todo, bool checked and/or epoch-seconds dueAt"
+    if len({update["id"] for update in updates}) != len(updates):
+        return None, "Each id may appear only once"
+    return updates, None
+
+
+def bulk_update_todos(owner, query, data):
+    updates, error = validate_bulk(data)
+    if error:
+        return {"error": error}, 400
+
+    client = dynamodb.meta.client
+    params = [dict(todo_update(owner, u["id"], u), TableName=table.name) for u in updates]
+
+    if data.get("atomic"):
+        # All or nothing; the cancellation reasons line up with the updates
+        try:
+            client.transact_write_items(TransactItems=[{"Update": p} for p in params])
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get("CancellationReasons", [])
+            results = []
+            for update, reason in zip(updates, reasons):
+                code = reason.get("Code", "None")
+                if code == "ConditionalCheckFailed":
+                    results.append({"id": update["id"], "status": 404, "error": "Todo not found"})
+                elif code == "None":
+                    results.append({"id": update["id"], "status": 409, "error": "Not applied, transaction cancelled"})
+                else:
+                    results.append({"id": update["id"], "status": 409, "error": code})
+            return {"atomic": True, "results": results}, 409
+        except Exception as e:
+            print(e)
+            return {"error": "Internal Server Error"}, 500
+        return {"atomic": True, "results": [{"id": u["id"], "status": 200} for u in updates]}, 200
+
+    # Independent updates in parallel; the low-level client is thread-safe
+    # where the Table resource is not
+    def apply(update, update_params):
+        try:
+            resp = client.update_item(ReturnValues="ALL_NEW", **update_params)
+        except client.exceptions.ConditionalCheckFailedException:
+            return {"id": update["id"], "status": 404, "error": "Todo not found"}
+        except Exception as e:
+            print(e)
+            return {"id": update["id"], "status": 500, "error": "Internal Server Error"}
+        return {"id": update["id"], "status": 200, "item": resp["Attributes"]}
+
+    with ThreadPoolExecutor(max_workers=BULK_WORKERS) as pool:
+        results = list(pool.map(apply, updates, params))
+    status = 200 if all(r["status"] == 200 for r in results) else 207
+    return {"atomic": False, "results": results}, status
+
+
+def delete_todo(owner, query, data, id):
+    changed_at = next_change_ms()
+    try:
+        # Keep a tombstone for /todos/changes. Dropping ownerCheckedState and
+        # orderKey takes it out of those indexes; the full list filters on deletedAt.
+        table.update_item(
+            Key={"owner": owner, "id": id},
+            ExpressionAttributeNames={"#todo_text": "todo"},
+            ExpressionAttributeValues={
+                ":deletedAt": changed_at // 1000,
+                ":changedAt": changed_at,
+                ":expiresAt": changed_at // 1000 + TOMBSTONE_TTL,
+                ":one": 1,
+                ":zero": 0,
+            },
+            UpdateExpression=(
+                "SET deletedAt = :deletedAt, changedAt = :changedAt, expiresAt = :expiresAt,"
+                " version = if_not_exists(version, :zero) + :one"
+                " REMOVE #todo_text, checked, ownerCheckedState, orderKey, dueAt, dueBucket, createdAt, updatedAt"
+            ),
+            ConditionExpression=LIVE_TODO  # ensures item exists
+        )
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return {"error": "Todo not found"}, 404
+
+    return {"data": "Deletion Successful!"}, 200
+
+
+def move_todo(owner, query, data, id):
+    """Place a todo between two neighbours by rewriting only its order key."""
+    if (
+        not isinstance(data, dict) or not {"after", "before"} <= data.keys()
+        or not all(v is None or isinstance(v, str) for v in (data["after"], data["before"]))
+        or data["after"] == data["before"] or id in (data["after"], data["before"])
+    ):
+        return {"error": "Body must be {\"after\": id or null, \"before\": id or null} naming two other todos"}, 400
+
+    neighbour_ids = [n for n in (data["after"], data["before"]) if n is not None]
+    keys = {}
+    if neighbour_ids:
+        resp = dynamodb.batch_get_item(RequestItems={
+            table.name: {"Keys": [{"owner": owner, "id": n} for n in neighbour_ids]},
+        })
+        keys = {item["id"]: item.get("orderKey") for item in resp["Responses"].get(table.name, [])}
+    low = keys.get(data["after"]) if data["after"] else None
+    high = keys.get(data["before"]) if data["before"] else None
+    if low and high and low == high:
+        # Two creates racing for the end of the list got the same key; nothing
+        # fits between them until the owner's keys are respaced
+        request_rebalance(owner)
+        return {"error": "Neighbours have changed, reload the list"}, 409
+    if any(keys.get(n) is None for n in neighbour_ids) or (low and high and low > high):
+        # Deleted, unordered or no longer adjacent since the client listed them
+        return {"error": "Neighbours have changed, reload the list"}, 409
+
+    order_key = ordering.key_between(low, high)
+    try:
+        resp = table.update_item(ReturnValues="ALL_NEW", **todo_update(owner, id, {}, order_key=order_key))
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return {"error": "Todo not found"}, 404
+    except Exception as e:
+        print(e)
+        return {"error": "Internal Server Error"}, 500
+
+    if len(order_key) > MAX_ORDER_KEY_LENGTH:
+        request_rebalance(owner)
+    return resp.get("Attributes"), 200
+
+
+def list_changes(owner, query, data):
+    try:
+        since = int(query.get("since", 0))
+        limit = int(query.get("limit", DEFAULT_PAGE_SIZE))
+        start_key = decode_cursor(query.get("cursor"), owner, OWNER_CHANGED_INDEX)
+    except ValueError:
+        return {"error": "Invalid since, limit or cursor"}, 400
+    if not 1 <= limit <= MAX_PAGE_SIZE or since < 0:
+        return {"error": f"limit must be 1-{MAX_PAGE_SIZE} and since a token from a previous sync"}, 400
+    if since and since < (time.time() - TOMBSTONE_TTL) * 1000:
+        # Tombstones older than this are gone; the client must reload the list
+        return {"error": "since is too old, reload the full list"}, 410
+
+    kwargs = {"Limit": limit}
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    resp = table.query(
+        IndexName=OWNER_CHANGED_INDEX,
+        KeyConditionExpression=Key("owner").eq(owner) & Key("changedAt").gt(since - CHANGE_OVERLAP_MS),
+        **kwargs
+    )
+    items = resp["Items"]
+    for item in items:
+        item.pop("expiresAt", None)
+    # Oldest first, so the last item carries the token for the next sync
+    return {
+        "items": items,
+        "cursor": encode_cursor(resp.get("LastEvaluatedKey")),
+        "since": int(items[-1]["changedAt"]) if items else since,
+    }, 200
+
+
+# (method, path, view, reads JSON body). Path parameters use Flask's <name>
+# syntax; static paths come before parameterized ones with the same prefix.
+ROUTES = [
+    ("POST", "/todos", create_todo, True),
+    ("GET", "/todos/list", list_todos, False),
+    ("PATCH", "/todos/bulk", bulk_update_todos, True),
+    ("GET", "/todos/changes", list_changes, False),
+    ("GET", "/todos/<id>", get_todo, False),
+    ("PUT", "/todos/update/<id>", update_todo, True),
+    ("POST", "/todos/move/<id>", move_todo, True),
+    ("DELETE", "/todos/delete/<id>", delete_todo, False),
+]
+
+
+def dispatch(view, owner, query, data, params):
+    if not owner:
+        return {"error": "Missing owner"}, 401
+    return view(owner, query, data, **params)
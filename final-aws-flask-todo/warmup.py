@@ -0,0 +1,101 @@
+import functools
+import json
+import os
+import socket
+import time
+from urllib.parse import urlparse
+
+import todos
+
+# Init-phase warmup (WARMUP_ON_INIT=true). Without it, the first request in a
+# new container loads the DynamoDB operation models, resolves the endpoint,
+# opens the TLS connection and, under Flask, compiles the URL map. Every
+# container logs its first request's latency so both settings can be compared.
+#
+# With SnapStart the init phase runs once, before the snapshot, so only the
+# offline steps are done then; DNS answers and sockets wouldn't survive the
+# restore, so the network steps move to an after-restore hook.
+
+ENABLED = os.environ.get("WARMUP_ON_INIT", "false").lower() == "true"
+OPERATIONS = ("GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query")
+WARMUP_KEY = {"owner": "__warmup__", "id": "__warmup__"}
+
+warmup_ms = None
+first_request_pending = True
+
+
+def attempt(step, fn, *args):
+    # A failed warmup only costs the latency it was meant to save; whatever
+    # broke is left for the request that needs it
+    try:
+        fn(*args)
+    except Exception as e:
+        print(f"Warmup step {step} failed: {e!r}")
+
+
+def prepare(app=None):
+    """Offline steps: service model shapes and the Flask URL map."""
+    model = todos.dynamodb.meta.client.meta.service_model
+    for name in OPERATIONS:
+        operation = model.operation_model(name)
+        operation.input_shape.members
+        operation.output_shape.members
+    if app is not None:
+        app.url_map.bind("localhost").match("/todos/list", method="GET")
+        with app.test_request_context("/todos/list"):
+            app.json.response({})
+
+
+def connect():
+    """Network steps: resolve the endpoint and make one cheap signed call."""
+    attempt("resolve", lambda: socket.getaddrinfo(
+        urlparse(todos.dynamodb.meta.client.meta.endpoint_url).hostname, 443, type=socket.SOCK_STREAM))
+    # 0.5 RCU; signs the request and leaves an open connection in the pool
+    attempt("call", lambda: todos.table.get_item(Key=WARMUP_KEY))
+
+
+def register_after_restore():
+    from snapshot_restore_py import register_after_restore
+    register_after_restore(after_restore)
+
+
+def after_restore():
+    global first_request_pending
+    start = time.perf_counter()
+    connect()
+    print(json.dumps({"metric": "warmup_after_restore", "ms": round((time.perf_counter() - start) * 1e3, 1)}))
+    first_request_pending = True
+
+
+def run(app=None):
+    global warmup_ms
+    if not ENABLED:
+        return
+    start = time.perf_counter()
+    attempt("prepare", prepare, app)
+    if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+        attempt("after_restore hook", register_after_restore)
+    else:
+        connect()
+    warmup_ms = round((time.perf_counter() - start) * 1e3, 1)
+
+
+def time_first_call(fn):
+    """Log how long the first call after init (or restore) takes."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        global first_request_pending
+        if not first_request_pending:
+            return fn(*args, **kwargs)
+        first_request_pending = False
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            print(json.dumps({
+                "metric": "first_request",
+                "ms": round((time.perf_counter() - start) * 1e3, 1),
+                "warmup": ENABLED,
+                "warmupMs": warmup_ms,
+            }))
+    return wrapper
@@ -1,40 +1,91 @@
 import os
 import json
-import uuid
 import datetime
+import hashlib
 import boto3
 from flask import Flask, request, Response, make_response, jsonify
 from botocore.exceptions import ClientError
 
-app = Flask(__name__)
+import subscribers
+import warmup
+from quotes_cache import QuotesCache
 
-# DynamoDB client setup
-dynamodb_client = boto3.client('dynamodb')
-if os.environ.get('IS_OFFLINE'):
-    dynamodb_client = boto3.client(
-        'dynamodb',
-        region_name='localhost',
-        endpoint_url='http://localhost:8000'
-    )
+app = Flask(__name__)
 
 # S3 client setup
 s3 = boto3.client('s3')
 bucket_name = 'soumya1998-json-bucket'
-USERS_TABLE = os.environ.get('USERS_TABLE', 'default-users-table')
+quotes_cache = QuotesCache(s3, bucket_name, 'quotes.json', ttl=int(os.environ.get('QUOTES_CACHE_TTL', '60')))
+
+# Browser/proxy caching of the quotes routes. Validators come from the S3 ETag
+# and LastModified of quotes.json, so they change exactly when the file does.
+QUOTES_MAX_AGE = int(os.environ.get('QUOTES_MAX_AGE', '300'))
+QUOTES_STALE_WHILE_REVALIDATE = int(os.environ.get('QUOTES_STALE_WHILE_REVALIDATE', '86400'))
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+    "Access-Control-Allow-Headers": "*"
+}
+
+
+def cacheable_response(document, body, variant=None, max_age=QUOTES_MAX_AGE):
+    """200 with ETag/Last-Modified/Cache-Control, or 304 if the client's copy is current."""
+    response = Response(body, status=200, mimetype="application/json", headers=CORS_HEADERS)
+    etag = document.etag.strip('"')
+    if variant:
+        # Responses derived from the file get their own validator per variant
+        etag = f"{etag}-{hashlib.sha1(variant.encode('utf-8')).hexdigest()[:16]}"
+    response.set_etag(etag)
+    response.last_modified = document.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.stale_while_revalidate = QUOTES_STALE_WHILE_REVALIDATE
+    return response.make_conditional(request)
+
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+def search_quotes(document, args):
+    """Paginated /quotes?q=&author= results, joined from the pre-serialized quotes."""
+    try:
+        limit = int(args.get('limit', SEARCH_PAGE_SIZE))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        limit = offset = -1
+    positions = document.index.search(q=args.get('q'), author=args.get('author'))
+    if positions is None or not 1 <= limit <= MAX_SEARCH_PAGE_SIZE or offset < 0:
+        return Response(
+            json.dumps({"error": f"q and author need a word, limit must be 1-{MAX_SEARCH_PAGE_SIZE} and offset >= 0"}),
+            status=400,
+            mimetype="application/json",
+            headers=CORS_HEADERS
+        )
+
+    page = positions[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(positions) else None
+    body = b"".join([
+        b'{"quotes": [', b", ".join(document.quote_bodies[p] for p in page), b"], ",
+        json.dumps({"total": len(positions), "offset": offset, "nextOffset": next_offset})[1:].encode("utf-8"),
+    ])
+    return cacheable_response(document, body, variant=request.query_string.decode('utf-8'))
 
 
 # ---------------- QUOTES ROUTE ----------------
 @app.route('/quotes', methods=['GET'])
 def getQuotes():
     try:
-        object_key = 'quotes.json'
-        response = s3.get_object(Bucket=bucket_name, Key=object_key)
-        quotes_data = response['Body'].read().decode('utf-8')
-        quotes_list = json.loads(quotes_data)
+        document = quotes_cache.get()
+        if 'q' in request.args or 'author' in request.args:
+            return search_quotes(document, request.args)
 
+        return cacheable_response(document, document.body)
+    except Exception as e:
         return Response(
-            json.dumps(quotes_list),
-            status=200,
+            json.dumps({"error": f"Failed to fetch quotes: {str(e)}"}),
+            status=500,
             mimetype="application/json",
             headers={
                 "Access-Control-Allow-Origin": "*",
@@ -42,25 +93,55 @@ def getQuotes():
                 "Access-Control-Allow-Headers": "*"
             }
         )
+
+
+def quote_response(respond):
+    try:
+        document = quotes_cache.get()
+        if not document.quotes:
+            return Response(
+                json.dumps({"error": "No quotes available"}),
+                status=404,
+                mimetype="application/json",
+                headers=CORS_HEADERS
+            )
+        return respond(document)
     except Exception as e:
         return Response(
             json.dumps({"error": f"Failed to fetch quotes: {str(e)}"}),
             status=500,
             mimetype="application/json",
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "*",
-                "Access-Control-Allow-Headers": "*"
-            }
+            headers=CORS_HEADERS
         )
 
 
+@app.route('/quotes/today', methods=['GET'])
+def getQuoteOfTheDay():
+    def respond(document):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # Cached copies must not outlive the UTC day
+        midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), now.tzinfo)
+        body = document.quote_bodies[document.today_index(now.date())]
+        max_age = min(QUOTES_MAX_AGE, int((midnight - now).total_seconds()))
+        return cacheable_response(document, body, variant=now.date().isoformat(), max_age=max_age)
+    return quote_response(respond)
+
+
+@app.route('/quotes/random', methods=['GET'])
+def getRandomQuote():
+    def respond(document):
+        response = Response(document.quote_bodies[document.random_index()], status=200, mimetype="application/json", headers=CORS_HEADERS)
+        response.cache_control.no_store = True
+        return response
+    return quote_response(respond)
+
+
 # ---------------- SUBSCRIBE ROUTE ----------------
 @app.route('/subscribe', methods=['POST'])
 def subscribeUser():
     try:
         data = request.get_json(force=True)
-        if not data or "email" not in data:
+        if not data or not isinstance(data.get("email"), str) or not data["email"].strip():
             return Response(
                 json.dumps({"message": "Email is required"}),
                 status=400,
@@ -72,21 +153,10 @@ def subscribeUser():
                 }
             )
 
-        timeStamp = datetime.datetime.now().isoformat()
-        params = {
-            "TableName": USERS_TABLE,
-            "Item": {
-                "userId": {"S": uuid.uuid4().hex},
-                "email": {"S": data["email"]},
-                "createdAt": {"S": timeStamp},
-                "subscriber": {"BOOL": True},
-                "updatedAt": {"S": timeStamp}
-            }
-        }
-        dynamodb_client.put_item(**params)
+        created = subscribers.add_subscriber(data["email"])
 
         return Response(
-            json.dumps({"message": "Subscription successful"}),
+            json.dumps({"message": "Subscription successful" if created else "Already subscribed"}),
             status=200,
             mimetype="application/json",
             headers={
@@ -132,4 +202,8 @@ def resource_not_found(e):
             "Access-Control-Allow-Methods": "*",
             "Access-Control-Allow-Headers": "*"
         }
-    )
\ No newline at end of file
+    )
+
+
+app.wsgi_app = warmup.time_first_request(app.wsgi_app)
+warmup.run(app, s3, quotes_cache, subscribers.dynamodb_client, subscribers.USERS_TABLE)
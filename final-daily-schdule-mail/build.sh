@@ -4,7 +4,8 @@ set -e
 rm -rf dist
 mkdir -p dist
 
-rm -rf layer/python/common/python
+# Clear installed packages but keep the common layer's own module(s)
+find layer/python/common/python -mindepth 1 -maxdepth 1 ! -name 'http_client.py' -exec rm -rf {} + 2>/dev/null || true
 rm -rf layer/python/flask/python
 
 mkdir -p layer/python/common/python
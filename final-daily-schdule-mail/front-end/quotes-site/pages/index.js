@@ -148,21 +148,15 @@ export default function Home({ randomQuote, error }) {
 export async function getServerSideProps() {
   try {
     const res = await axios.get(
-      "https://byclh6knwl.execute-api.ap-south-1.amazonaws.com/dev/quotes"
+      "https://byclh6knwl.execute-api.ap-south-1.amazonaws.com/dev/quotes/random"
     );
-    const quotes = res.data;
-
-    if (!quotes || !Array.isArray(quotes.quotes) || quotes.quotes.length === 0) {
+    return { props: { randomQuote: res.data } };
+  } catch (error) {
+    if (error.response?.status === 404) {
       return {
         props: { randomQuote: { quote: "No quotes available", author: "System" } },
       };
     }
-
-    const listLength = quotes.quotes.length;
-    const randomQuote = quotes.quotes[Math.floor(Math.random() * listLength)];
-
-    return { props: { randomQuote } };
-  } catch (error) {
     return { props: { error: { message: error.message } } };
   }
 }
@@ -0,0 +1,115 @@
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared outbound HTTP client for the common layer. One module-level Session
+# keeps TLS connections alive across warm invocations. Every call's connect and
+# read timeouts are capped by the time the Lambda has left. Idempotent calls
+# are retried with full-jitter backoff, and each attempt logs a per-host
+# latency metric in CloudWatch Embedded Metric Format (no API calls needed).
+#
+#     import http_client
+#     response = http_client.request("GET", url, context=context)
+
+CONNECT_TIMEOUT = 2.0
+READ_TIMEOUT = 10.0
+DEADLINE_MARGIN = 0.3  # seconds kept back for the caller to respond
+DEFAULT_BUDGET = 15.0  # when there is no Lambda context
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 2.0
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+METRIC_NAMESPACE = "DailyScheduleMail/HTTP"
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+
+def emit_metric(host, method, elapsed_ms, status):
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRIC_NAMESPACE,
+                "Dimensions": [["Host"]],
+                "Metrics": [
+                    {"Name": "Latency", "Unit": "Milliseconds"},
+                    {"Name": "Error", "Unit": "Count"},
+                    {"Name": "Throttled", "Unit": "Count"},
+                ],
+            }],
+        },
+        "Host": host,
+        "Method": method,
+        "Status": status,
+        "Latency": round(elapsed_ms, 1),
+        # A 429 is an error too, and also counted on its own
+        "Error": 0 if isinstance(status, int) and status < 500 and status != 429 else 1,
+        "Throttled": 1 if status == 429 else 0,
+    }))
+
+
+def request(method, url, context=None, retries=2, idempotent=None, **kwargs):
+    """requests.request through the shared session, bounded by the Lambda's remaining time.
+
+    Connection errors, timeouts and 429/5xx responses are retried up to
+    `retries` times for idempotent methods; pass idempotent=True to retry a
+    POST that is safe to repeat (e.g. one carrying an idempotency key).
+    A caller's timeout= (seconds or a (connect, read) pair) replaces the
+    defaults but is still capped by the time left.
+    Raises requests.Timeout once the time budget is spent.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    budget = context.get_remaining_time_in_millis() / 1000 if context else DEFAULT_BUDGET
+    deadline = time.monotonic() + budget - DEADLINE_MARGIN
+    host = urlsplit(url).hostname
+    connect_timeout, read_timeout = CONNECT_TIMEOUT, READ_TIMEOUT
+    timeout = kwargs.pop("timeout", None)
+    if isinstance(timeout, tuple):
+        connect_timeout, read_timeout = timeout
+    elif timeout is not None:
+        connect_timeout = read_timeout = timeout
+
+    attempt = 0
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise requests.Timeout(f"No time left for {method} {url}")
+        # The read timeout bounds each socket read, not the whole body
+        timeout = (min(connect_timeout or left, left), min(read_timeout or left, left))
+
+        start = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            emit_metric(host, method, (time.monotonic() - start) * 1000, type(e).__name__)
+            if not idempotent or attempt >= retries:
+                raise
+        else:
+            emit_metric(host, method, (time.monotonic() - start) * 1000, response.status_code)
+            if response.status_code not in RETRY_STATUSES or not idempotent or attempt >= retries:
+                return response
+            response.close()
+
+        # Full jitter, never sleeping past the deadline
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise requests.Timeout(f"No time left to retry {method} {url}")
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
@@ -0,0 +1,71 @@
+import bisect
+import re
+
+# Inverted index over quotes.json, built once per document load (see
+# QuotesDocument). Every word of a quote's text and author maps to the sorted
+# positions of the quotes containing it; author words also get their own index
+# for author-only browsing. A query word matches every indexed word it is a
+# prefix of - found by bisecting the sorted vocabulary - and the words of a
+# query are ANDed, so results come from a few set operations instead of a pass
+# over every quote.
+
+WORD = re.compile(r"\w+")
+
+
+def words(text):
+    # Curly apostrophes in the source text shouldn't split words differently
+    return WORD.findall(text.casefold().replace("’", "'").replace("'", ""))
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, position, text):
+        for word in words(text):
+            self.postings.setdefault(word, set()).add(position)
+
+    def freeze(self):
+        self.vocabulary = sorted(self.postings)
+
+    def prefix_matches(self, prefix):
+        matches = set()
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            matches |= self.postings[word]
+        return matches
+
+    def search(self, query):
+        """Positions matching every word of `query` by prefix, or None if it has no words."""
+        result = None
+        for prefix in words(query):
+            matches = self.prefix_matches(prefix)
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result
+
+
+class QuoteIndex:
+    def __init__(self, quotes):
+        self.text = PrefixIndex()
+        self.author = PrefixIndex()
+        for position, quote in enumerate(quotes):
+            self.text.add(position, f"{quote.get('quote', '')} {quote.get('author', '')}")
+            self.author.add(position, quote.get("author", ""))
+        self.text.freeze()
+        self.author.freeze()
+
+    def search(self, q=None, author=None):
+        """Sorted positions of quotes matching q (text or author) and author; None if a query has no words."""
+        result = None
+        for index, query in ((self.text, q), (self.author, author)):
+            if query is None:
+                continue
+            matches = index.search(query)
+            if matches is None:
+                return None
+            result = matches if result is None else result & matches
+        return sorted(result)
@@ -0,0 +1,74 @@
+import datetime
+import hashlib
+import json
+import random
+import time
+
+from botocore.exceptions import ClientError
+
+from quote_search import QuoteIndex
+
+# Container-level cache of quotes.json. The parsed document and the exact
+# response bytes are kept between invocations; after `ttl` seconds the next
+# request revalidates with a conditional GET on the stored ETag, which costs a
+# 304 with no body unless the file actually changed. If S3 fails during a
+# revalidation the cached copy keeps being served.
+
+
+class QuotesDocument:
+    """A loaded quotes.json plus everything derived from it, built once per load."""
+
+    def __init__(self, raw, etag, last_modified):
+        self.data = json.loads(raw)
+        self.body = json.dumps(self.data).encode("utf-8")
+        self.etag = etag
+        self.last_modified = last_modified
+        self.quotes = self.data.get("quotes", [])
+        # Single-quote responses, serialized up front
+        self.quote_bodies = [json.dumps(quote).encode("utf-8") for quote in self.quotes]
+        self.index = QuoteIndex(self.quotes)
+
+    def today_index(self, day=None):
+        """Quote of the given UTC day (default today): the same in every container."""
+        day = day or datetime.datetime.now(datetime.timezone.utc).date()
+        digest = hashlib.sha256(day.isoformat().encode("ascii")).digest()
+        return int.from_bytes(digest[:8], "big") % len(self.quotes)
+
+    def random_index(self):
+        return random.randrange(len(self.quotes))
+
+
+class QuotesCache:
+    def __init__(self, s3, bucket, key, ttl=60):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.ttl = ttl
+        self.document = None
+        self.checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self.document is not None and now - self.checked_at < self.ttl:
+            return self.document
+
+        kwargs = {"Bucket": self.bucket, "Key": self.key}
+        if self.document is not None:
+            kwargs["IfNoneMatch"] = self.document.etag
+        try:
+            response = self.s3.get_object(**kwargs)
+        except ClientError as e:
+            if self.document is None:
+                raise
+            if e.response["Error"]["Code"] not in ("304", "NotModified"):
+                print(f"Revalidating {self.key} failed, serving cached copy: {e}")
+            self.checked_at = now
+            return self.document
+
+        self.document = QuotesDocument(
+            response["Body"].read().decode("utf-8"),
+            response["ETag"],
+            response["LastModified"],
+        )
+        self.checked_at = now
+        return self.document
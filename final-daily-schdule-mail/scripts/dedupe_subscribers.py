@@ -0,0 +1,117 @@
+"""Merge duplicate subscribers into one item per normalized email.
+
+Subscribers used to get a random userId, so subscribing twice (or with a
+different case) left several items for one address. Each address now lives
+at subscribers.subscriber_id(email). This moves every legacy item there and
+merges the duplicates: the earliest createdAt is kept, and the subscriber flag
+comes from whichever item was updated last. Each address is written and its
+old items deleted in one transaction (more than 99 old items spill into
+follow-up transactions). Every write is conditional on the item being
+unchanged since the scan, so an address the app touched meanwhile is skipped
+and reported; re-run to pick it up. Re-running finds nothing left to move.
+
+    python scripts/dedupe_subscribers.py --table users-table-dev --segments 8 --dry-run
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import subscribers  # noqa: E402
+
+dynamodb = boto3.resource("dynamodb")
+# TransactWriteItems limit
+TRANSACTION_LIMIT = 100
+
+
+def scan_segment(table, segment, total_segments):
+    items = []
+    kwargs = {"Segment": segment, "TotalSegments": total_segments}
+    while True:
+        resp = table.scan(**kwargs)
+        items.extend(resp["Items"])
+        if "LastEvaluatedKey" not in resp:
+            return items
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def merge(user_id, items):
+    """One item for an address from all of its items."""
+    first = min(items, key=lambda item: item.get("createdAt", ""))
+    last = max(items, key=lambda item: item.get("updatedAt", ""))
+    merged = dict(first, userId=user_id, subscriber=last.get("subscriber", True))
+    if "updatedAt" in last:
+        merged["updatedAt"] = last["updatedAt"]
+    return merged
+
+
+def unchanged(item):
+    """Condition that item is still as scanned (by its updatedAt)."""
+    if "updatedAt" not in item:
+        return {"ConditionExpression": "attribute_exists(userId) AND attribute_not_exists(updatedAt)"}
+    return {
+        "ConditionExpression": "updatedAt = :seen",
+        "ExpressionAttributeValues": {":seen": item["updatedAt"]},
+    }
+
+
+def dedupe(table_name, user_id, items):
+    """Move an address to user_id; returns False if a write was cancelled."""
+    current = next((item for item in items if item["userId"] == user_id), None)
+    put = {"TableName": table_name, "Item": merge(user_id, items)}
+    put.update(unchanged(current) if current else {"ConditionExpression": "attribute_not_exists(userId)"})
+    deletes = [
+        {"Delete": {"TableName": table_name, "Key": {"userId": item["userId"]}, **unchanged(item)}}
+        for item in items if item["userId"] != user_id
+    ]
+    # A transaction takes at most 100 actions. The first one carries the Put; if a
+    # later one is cancelled the leftovers are merged again on the next run.
+    batches = [[{"Put": put}] + deletes[:TRANSACTION_LIMIT - 1]]
+    batches += [deletes[i:i + TRANSACTION_LIMIT] for i in range(TRANSACTION_LIMIT - 1, len(deletes), TRANSACTION_LIMIT)]
+    client = dynamodb.meta.client
+    for actions in batches:
+        try:
+            client.transact_write_items(TransactItems=actions)
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = [reason.get("Code") for reason in e.response.get("CancellationReasons", [])]
+            print(f"Skipped {items[0]['email']}: transaction cancelled {reasons}")
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be merged")
+    args = parser.parse_args()
+
+    table = dynamodb.Table(args.table)
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        segments = pool.map(lambda segment: scan_segment(table, segment, args.segments), range(args.segments))
+        # Duplicates can sit in different segments, so group after the whole scan
+        by_id = defaultdict(list)
+        for items in segments:
+            for item in items:
+                if item.get("email"):
+                    by_id[subscribers.subscriber_id(item["email"])].append(item)
+
+        pending = {
+            user_id: items for user_id, items in by_id.items()
+            if any(item["userId"] != user_id for item in items)
+        }
+        duplicates = sum(len(items) - 1 for items in pending.values())
+        print(f"{len(by_id)} addresses, {len(pending)} to move, {duplicates} duplicate items")
+        if args.dry_run:
+            return
+        moved = list(pool.map(lambda entry: dedupe(args.table, *entry), pending.items()))
+    failed = moved.count(False)
+    print(f"Moved {len(pending) - failed} addresses, {failed} skipped (changed during the run)")
+
+
+if __name__ == "__main__":
+    main()
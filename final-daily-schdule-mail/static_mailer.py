@@ -1,10 +1,25 @@
 import os
 import json
 import boto3
-import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 
-# Initialize SNS client
-sns = boto3.client("sns")
+import subscribers
+
+# Initialize SNS client, bounded like the subscriber client so a stalled
+# publish ends within the invocation
+sns = boto3.client("sns", config=subscribers.CLIENT_CONFIG)
+
+# The SNS publish and the subscriber write are independent, so they run side
+# by side on a pool kept warm across invocations, bounded by the time Lambda
+# has left minus a margin to build the response.
+side_effects = ThreadPoolExecutor(max_workers=4)  # headroom if a timed-out call is still running
+DEADLINE_MARGIN_MS = 500
+DEFAULT_DEADLINE_MS = 10000  # when invoked without a Lambda context
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",  # Required for CORS
+    "Access-Control-Allow-Credentials": "false"
+}
 
 def publish_to_sns(message: str):
     """Publish a message to SNS topic."""
@@ -20,6 +35,25 @@ def build_email_body(identity, form):
            f"Email: {form.get('email')}\n" \
            f"Service information: {identity.get('sourceIp')} - {identity.get('userAgent')}"
 
+def run_side_effects(tasks, context):
+    """Run {name: callable} concurrently; returns {name: {"ok": ..., ...}} within the deadline."""
+    remaining_ms = context.get_remaining_time_in_millis() if context else DEFAULT_DEADLINE_MS
+    futures = {name: side_effects.submit(task) for name, task in tasks.items()}
+    wait(futures.values(), timeout=max(remaining_ms - DEADLINE_MARGIN_MS, 0) / 1000)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            # Left running; the clients' connect/read timeouts and retry cap
+            # (subscribers.CLIENT_CONFIG) end it within about 6 s
+            results[name] = {"ok": False, "error": "Timed out"}
+        elif future.exception() is not None:
+            print(f"Error in {name}:::", str(future.exception()))
+            results[name] = {"ok": False, "error": str(future.exception())}
+        else:
+            results[name] = {"ok": True}
+    return results
+
 def static_mailer(event, context):
     try:
         print("EVENT::", event)
@@ -31,27 +65,26 @@ def static_mailer(event, context):
         identity = event.get("requestContext", {}).get("identity", {})
         email_body = build_email_body(identity, data)
 
-        # Publish to SNS
-        publish_to_sns(email_body)
+        tasks = {"message": lambda: publish_to_sns(email_body)}
+        if isinstance(data.get("email"), str) and data["email"].strip():
+            tasks["subscription"] = lambda: subscribers.add_subscriber(data["email"])
+        results = run_side_effects(tasks, context)
 
-        # Call subscribe endpoint
-        try:
-            response = requests.post(
-                "https://byclh6knwl.execute-api.ap-south-1.amazonaws.com/dev/subscribe",
-                json={"email": data.get("email")}
-            )
-            print("Subscribe response:", response.text)
-        except Exception as e:
-            print("Error subscribing user:::", str(e))
+        # 207 when only some side effects succeeded, so the client can tell
+        # a sent message from a recorded subscription
+        succeeded = sum(result["ok"] for result in results.values())
+        if succeeded == len(results):
+            status, message = 200, "OK"
+        elif succeeded:
+            status, message = 207, "Partially completed"
+        else:
+            status, message = 502, "Failed"
 
         # Return Lambda response
         return {
-            "statusCode": 200,
-            "headers": {
-                "Access-Control-Allow-Origin": "*",  # Required for CORS
-                "Access-Control-Allow-Credentials": "false"
-            },
-            "body": json.dumps({"message": "OK"})
+            "statusCode": status,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"message": message, "results": results})
         }
 
     except Exception as e:
@@ -59,4 +92,4 @@ def static_mailer(event, context):
         return {
             "statusCode": 500,
             "body": json.dumps({"message": f"Error: {str(e)}"})
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,66 @@
+import os
+import uuid
+import datetime
+import boto3
+from botocore.config import Config
+
+# Subscriber store shared by the API (/subscribe) and the static mailer, so
+# both record subscriptions with the same DynamoDB write instead of the mailer
+# calling the public /subscribe endpoint over HTTP.
+
+# Worst case 2 attempts x (1 s connect + 2 s read), inside the functions' 6 s
+# timeout; botocore's defaults (60 s each, plus retries) would let a stalled
+# write outlive the invocation and hold a thread of the mailer's pool
+CLIENT_CONFIG = Config(connect_timeout=1, read_timeout=2, retries={"total_max_attempts": 2, "mode": "standard"})
+
+dynamodb_client = boto3.client('dynamodb', config=CLIENT_CONFIG)
+if os.environ.get('IS_OFFLINE'):
+    dynamodb_client = boto3.client(
+        'dynamodb',
+        region_name='localhost',
+        endpoint_url='http://localhost:8000',
+        config=CLIENT_CONFIG
+    )
+
+USERS_TABLE = os.environ.get('USERS_TABLE', 'default-users-table')
+
+# userId is derived from the normalized email, so one address is one item and
+# subscribing twice hits the same key. Changing the namespace would orphan
+# every existing subscriber.
+SUBSCRIBER_NAMESPACE = uuid.UUID("3cfb0fa0-5260-4176-8fdb-590e9849506a")
+
+
+def normalize_email(email):
+    return email.strip().casefold()
+
+
+def subscriber_id(email):
+    return uuid.uuid5(SUBSCRIBER_NAMESPACE, normalize_email(email)).hex
+
+
+def add_subscriber(email):
+    """Subscribe an email; returns False if it already was subscribed (nothing is written).
+
+    Raises botocore's ClientError if DynamoDB rejects the write.
+    """
+    timeStamp = datetime.datetime.now().isoformat()
+    try:
+        dynamodb_client.update_item(
+            TableName=USERS_TABLE,
+            Key={"userId": {"S": subscriber_id(email)}},
+            # New address, or one that unsubscribed earlier
+            ConditionExpression="attribute_not_exists(userId) OR subscriber = :false",
+            UpdateExpression=(
+                "SET email = :email, subscriber = :true, updatedAt = :now,"
+                " createdAt = if_not_exists(createdAt, :now)"
+            ),
+            ExpressionAttributeValues={
+                ":email": {"S": email.strip()},
+                ":true": {"BOOL": True},
+                ":false": {"BOOL": False},
+                ":now": {"S": timeStamp}
+            }
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
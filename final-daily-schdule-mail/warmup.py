@@ -0,0 +1,107 @@
+import functools
+import json
+import os
+import socket
+import time
+from urllib.parse import urlparse
+
+# Init-phase warmup for the quotes/subscribe API, enabled with
+# WARMUP_ON_INIT=true. A cold container otherwise spends its first request
+# loading the S3 and DynamoDB models, resolving both endpoints, opening two TLS
+# connections, fetching quotes.json and compiling Flask's URL map.
+#
+# Under SnapStart, init runs before the snapshot is taken: the model and URL
+# map work is captured in it, and the network half runs after each restore.
+
+ENABLED = os.environ.get("WARMUP_ON_INIT", "false").lower() == "true"
+MODEL_OPERATIONS = {"s3": ("GetObject",), "dynamodb": ("GetItem", "PutItem")}
+
+warmup_ms = None
+first_request_pending = True
+
+
+def attempt(step, fn, *args):
+    # Warmup only saves latency: whatever fails here (a bad quotes.json
+    # included) is left for the request that needs it to fail on
+    try:
+        fn(*args)
+    except Exception as e:
+        print(f"Warmup step {step} failed: {e!r}")
+
+
+def load_models(*clients):
+    for client in clients:
+        model = client.meta.service_model
+        for name in MODEL_OPERATIONS.get(model.service_name, ()):
+            operation = model.operation_model(name)
+            operation.input_shape.members
+            operation.output_shape.members
+
+
+def warm_flask(app):
+    app.url_map.bind("localhost").match("/quotes", method="GET")
+    with app.test_request_context("/quotes"):
+        app.make_response(("{}", 200))
+
+
+def open_connections(s3, quotes_cache, dynamodb_client, table_name):
+    """Resolve each endpoint and make one signed call per client."""
+    calls = (
+        # Fills (or revalidates) the quotes cache for the first /quotes
+        (s3, quotes_cache.get),
+        (dynamodb_client, lambda: dynamodb_client.get_item(
+            TableName=table_name, Key={"userId": {"S": "__warmup__"}})),
+    )
+    for client, call in calls:
+        service = client.meta.service_model.service_name
+        attempt(f"{service} resolve", socket.getaddrinfo,
+                urlparse(client.meta.endpoint_url).hostname, 443, 0, socket.SOCK_STREAM)
+        attempt(f"{service} call", call)
+
+
+def run(app, s3, quotes_cache, dynamodb_client, table_name):
+    global warmup_ms
+    if not ENABLED:
+        return
+    start = time.perf_counter()
+    attempt("models", load_models, s3, dynamodb_client)
+    attempt("flask", warm_flask, app)
+    connect = functools.partial(open_connections, s3, quotes_cache, dynamodb_client, table_name)
+    if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start":
+        def after_restore():
+            global first_request_pending
+            restore_start = time.perf_counter()
+            connect()
+            print(json.dumps({"metric": "warmup_after_restore", "ms": round((time.perf_counter() - restore_start) * 1e3, 1)}))
+            first_request_pending = True
+
+        def register():
+            from snapshot_restore_py import register_after_restore
+            register_after_restore(after_restore)
+
+        attempt("after_restore hook", register)
+    else:
+        connect()
+    warmup_ms = round((time.perf_counter() - start) * 1e3, 1)
+
+
+def time_first_request(wsgi_app):
+    """Wrap app.wsgi_app to log the latency of the container's first request."""
+    @functools.wraps(wsgi_app)
+    def wrapper(environ, start_response):
+        global first_request_pending
+        if not first_request_pending:
+            return wsgi_app(environ, start_response)
+        first_request_pending = False
+        start = time.perf_counter()
+        try:
+            return wsgi_app(environ, start_response)
+        finally:
+            print(json.dumps({
+                "metric": "first_request",
+                "path": environ.get("PATH_INFO"),
+                "ms": round((time.perf_counter() - start) * 1e3, 1),
+                "warmup": ENABLED,
+                "warmupMs": warmup_ms,
+            }))
+    return wrapper
@@ -0,0 +1,230 @@
+"""Benchmark the thumbnail pipeline stages on synthetic images.
+
+Every case runs in a fresh process against the in-memory S3 stand-in, so the
+reported peak RSS belongs to that image alone. Results are written as JSON and
+can be compared against an earlier run with --compare. With --transforms each
+case runs the given spec twice, literally and through transforms.optimize().
+
+    python benchmarks/thumbnail_pipeline.py --output results.json
+    python benchmarks/thumbnail_pipeline.py --megapixels 12 50 --formats JPEG --compare results.json
+    python benchmarks/thumbnail_pipeline.py --transforms "crop:0.1,0.1,0.9,0.9;grayscale;resize:256x256"
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("THUMBNAIL_SIZE", "128")
+os.environ.setdefault("DYNAMODB_TABLE", "benchmark-thumbnail-table")
+os.environ.setdefault("REGION_NAME", "ap-south-1")
+
+from PIL import Image, features  # noqa: E402
+
+import handler  # noqa: E402
+import transforms  # noqa: E402
+from local_aws import InMemoryS3  # noqa: E402
+
+
+BUCKET = "benchmark-bucket"
+DEFAULT_MEGAPIXELS = [0.5, 2, 8, 12, 24, 50]
+DEFAULT_FORMATS = ["PNG", "JPEG", "WEBP"]
+EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+
+def synthetic_image(megapixels, aspect=(4, 3)):
+    """Build an RGB image with gradients and noise so encoders do real work."""
+    width = int(round(math.sqrt(megapixels * 1_000_000 * aspect[0] / aspect[1])))
+    height = int(round(width * aspect[1] / aspect[0]))
+    return Image.merge("RGB", (
+        Image.linear_gradient("L").resize((width, height)),
+        Image.effect_noise((width, height), 32),
+        Image.radial_gradient("L").resize((width, height)),
+    ))
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_case(source_path, source_format, repeat, spec=None, plan_kind=None):
+    """Run every pipeline stage on one source file; executed in a child process."""
+    s3 = InMemoryS3()
+    handler.s3 = s3
+    key = os.path.basename(source_path)
+    thumbnail_key = handler.new_filename(key)
+    with open(source_path, "rb") as f:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=f.read())
+
+    baseline_rss = peak_rss_mb()
+    if spec is None:
+        stages = {"fetch_ms": [], "decode_ms": [], "resize_ms": [], "encode_ms": []}
+    else:
+        # decode happens inside the plan (the optimized one may draft the decoder)
+        stages = {"fetch_ms": [], "transform_ms": [], "encode_ms": []}
+    for _ in range(repeat):
+        with redirect_stdout(StringIO()):
+            started = time.perf_counter()
+            image = handler.get_S3_image(BUCKET, key)
+            fetched = time.perf_counter()
+            if spec is None:
+                image.load()
+                decoded = time.perf_counter()
+                thumbnail = handler.image_to_thumbnail(image)
+            else:
+                if plan_kind == "naive":
+                    plan = transforms.naive_plan(spec)
+                else:
+                    plan = transforms.optimize(spec, image.size, image.format)
+                estimated_peak = transforms.estimate_peak_bytes(plan, image.size, image.mode)
+                thumbnail = transforms.apply_plan(image, plan)
+            resized = time.perf_counter()
+            handler.upload_thumbnail_to_s3(BUCKET, thumbnail_key, thumbnail, s3.object_size(BUCKET, key))
+            encoded = time.perf_counter()
+        stages["fetch_ms"].append((fetched - started) * 1000)
+        if spec is None:
+            stages["decode_ms"].append((decoded - fetched) * 1000)
+            stages["resize_ms"].append((resized - decoded) * 1000)
+        else:
+            stages["transform_ms"].append((resized - fetched) * 1000)
+        stages["encode_ms"].append((encoded - resized) * 1000)
+        del image, thumbnail
+
+    peak_rss = peak_rss_mb()
+    width, height = Image.open(source_path).size
+    result = {
+        "format": source_format,
+        "width": width,
+        "height": height,
+        "input_bytes": s3.object_size(BUCKET, key),
+        "output_bytes": s3.object_size(BUCKET, thumbnail_key),
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(peak_rss, 1),
+        "pipeline_rss_mb": round(peak_rss - baseline_rss, 1),
+    }
+    for stage, samples in stages.items():
+        result[stage] = round(statistics.median(samples), 2)
+        result[stage.replace("_ms", "_min_ms")] = round(min(samples), 2)
+    result["total_ms"] = round(sum(result[stage] for stage in stages), 2)
+    if spec is not None:
+        result["plan"] = plan_kind
+        result["estimated_peak_mb"] = round(estimated_peak / (1024 * 1024), 1)
+    return result
+
+
+# How case processes are started. Linux carries ru_maxrss across fork and
+# exec, so a spawned child reported at least the parent's peak, which includes
+# the synthetic source image. Cases start from a fork server launched before
+# any image is allocated instead. Results record this; earlier spawn runs
+# overstate peak RSS and aren't comparable.
+START_METHOD = "forkserver"
+
+
+def case_context():
+    context = multiprocessing.get_context(START_METHOD)
+    multiprocessing.forkserver.ensure_running()
+    return context
+
+
+def run_benchmark(megapixels, formats, repeat, spec=None):
+    context = case_context()
+    cases = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mp in megapixels:
+            image = synthetic_image(mp)
+            for fmt in formats:
+                if fmt == "WEBP" and not features.check("webp"):
+                    print("Skipping WEBP: Pillow was built without WebP support")
+                    continue
+                path = os.path.join(workdir, f"source_{mp}mp.{EXTENSIONS[fmt]}")
+                image.save(path, format=fmt)
+                for plan_kind in ([None] if spec is None else ["naive", "optimized"]):
+                    # A fresh process per case keeps peak RSS from leaking between cases
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(run_case, path, fmt, repeat, spec, plan_kind).result()
+                    result["megapixels"] = mp
+                    cases.append(result)
+                    if spec is None:
+                        timings = (
+                            f"decode {result['decode_ms']:>9.1f} ms  resize {result['resize_ms']:>8.1f} ms"
+                        )
+                    else:
+                        timings = (
+                            f"{plan_kind:<9} transform {result['transform_ms']:>9.1f} ms  "
+                            f"est. {result['estimated_peak_mb']:>7.1f} MB"
+                        )
+                    print(
+                        f"{mp:>5} MP {fmt:<4}  {timings}  encode {result['encode_ms']:>7.1f} ms  "
+                        f"out {result['output_bytes']:>7} B  peak {result['peak_rss_mb']:>7.1f} MB"
+                    )
+                os.remove(path)
+            del image
+    return cases
+
+
+def compare(previous, current):
+    """Print per-case deltas against an earlier results file."""
+    if previous.get("start_method") != current["start_method"]:
+        print("Note: the earlier run predates fork-server cases; its peak_rss_mb includes the parent's peak")
+    before = {(c["megapixels"], c["format"], c.get("plan")): c for c in previous["cases"]}
+    for case in current["cases"]:
+        old = before.get((case["megapixels"], case["format"], case.get("plan")))
+        if old is None:
+            continue
+        deltas = []
+        for metric in ("total_ms", "peak_rss_mb", "output_bytes"):
+            if old[metric]:
+                deltas.append(f"{metric} {(case[metric] - old[metric]) / old[metric] * 100:+.1f}%")
+        print(f"{case['megapixels']:>5} MP {case['format']:<4}  " + "  ".join(deltas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=DEFAULT_MEGAPIXELS)
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, choices=sorted(EXTENSIONS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="thumbnail-benchmark.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--transforms", help="transform spec to run naive vs optimized (see transforms.py)")
+    args = parser.parse_args(argv)
+    spec = transforms.parse_spec(args.transforms) if args.transforms else None
+
+    results = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pillow": Image.__version__,
+        "machine": platform.machine(),
+        "thumbnail_size": handler.size,
+        "repeat": args.repeat,
+        "start_method": START_METHOD,
+        "transforms": spec,
+        "cases": run_benchmark(args.megapixels, args.formats, args.repeat, spec),
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
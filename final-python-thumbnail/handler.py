@@ -1,12 +1,24 @@
 import json
+import base64
+import hashlib
 from datetime import datetime
 import boto3
+from botocore.exceptions import ClientError
 from io import BytesIO
 from PIL import Image, ImageOps
 import os
+import re
 import uuid
 import urllib.parse
+import time
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import phash
+import hash_store
+from placeholder import image_placeholder
+from sprites import SPRITE_PREFIX, compose_sprite, sprite_filenames
+from signer import UrlSigner
+import transforms
 
 
 
@@ -14,6 +26,62 @@ s3 = boto3.client("s3")
 size = int(os.environ["THUMBNAIL_SIZE"])
 dbtable = str(os.environ["DYNAMODB_TABLE"])
 dynamodb = boto3.resource("dynamodb", region_name=os.environ["REGION_NAME"])
+bucket_name = os.environ.get("THUMBNAIL_BUCKET")
+signer = UrlSigner(s3, window_seconds=int(os.environ.get("SIGNED_URL_WINDOW", "900")))
+
+# On-demand renditions: only the configured sizes are rendered so arbitrary
+# w/h combinations can't fill the bucket with cache entries.
+RENDITION_PREFIX = "renditions/"
+RENDITION_SIZES = {
+    tuple(int(n) for n in entry.lower().split("x"))
+    for entry in os.environ.get("RENDITION_SIZES", "64x64,128x128,256x256,512x512").split(",")
+    if entry.strip()
+}
+RENDITION_FITS = transforms.FITS
+RENDITION_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+# Modes each output format can store; anything else (e.g. CMYK) is converted
+RENDITION_MODES = {
+    "PNG": ("1", "L", "LA", "I;16", "P", "RGB", "RGBA"),
+    "JPEG": ("L", "RGB"),
+    "WEBP": ("RGB", "RGBA"),
+}
+RENDITION_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Objects the service writes itself; uploads under these never get thumbnailed
+DERIVED_PREFIXES = (RENDITION_PREFIX, SPRITE_PREFIX, hash_store.HASH_INDEX_PREFIX)
+SPRITE_MAX_IDS = int(os.environ.get("SPRITE_MAX_IDS", "100"))
+SPRITE_INCOMPLETE_CACHE_CONTROL = "public, max-age=60"
+
+# Named transform specs (see transforms.py) selectable with ?preset= on the
+# render endpoint, and an optional spec applied before every thumbnail resize
+TRANSFORM_PRESETS = {
+    name: transforms.parse_spec(spec)
+    for name, spec in json.loads(os.environ.get("TRANSFORM_PRESETS") or "{}").items()
+}
+THUMBNAIL_TRANSFORMS = transforms.parse_spec(os.environ.get("THUMBNAIL_TRANSFORMS"))
+# Renditions are cached as immutable, so a preset's key names its spec too:
+# editing a preset renders new objects instead of serving the old ones
+PRESET_DIGESTS = {
+    name: hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:8]
+    for name, spec in TRANSFORM_PRESETS.items()
+}
+
+# Images decoded in parallel by the queue worker; bounded by memorySize
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "4"))
+
+# Perceptual hashes are held in memory per container and reloaded after the
+# TTL, from the packed index in the bucket (see hash_store.py). Only before the
+# first compaction is the table scanned instead, in parallel segments.
+HASH_INDEX_TTL = int(os.environ.get("HASH_INDEX_TTL", "300"))
+HASH_SCAN_SEGMENTS = int(os.environ.get("HASH_SCAN_SEGMENTS", "8"))
+MAX_SIMILAR_LIMIT = 500
+_hash_index = None
+_hash_index_loaded_at = 0.0
+_hash_base = None
 
 def get_S3_image(bucket, key):
     response = s3.get_object(Bucket=bucket, Key=key)
@@ -23,13 +91,47 @@ def get_S3_image(bucket, key):
 
 
 def image_to_thumbnail(image):
+    if THUMBNAIL_TRANSFORMS:
+        return transform_image(image, THUMBNAIL_TRANSFORMS, size, size, "cover")
     return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
 
 
+def transform_image(image, ops, width, height, fit):
+    # sharpen/watermark in a configured spec are meant for the output, so the
+    # resize goes in front of the first of them
+    at = next((i for i, op in enumerate(ops) if op["op"] not in transforms.SCALE_INVARIANT_OPS), len(ops))
+    resize = {"op": "resize", "width": width, "height": height, "fit": fit}
+    result, report = transforms.transform(image, list(ops[:at]) + [resize] + list(ops[at:]))
+    print(f"Transform: {report}")
+    return result
+
+
+def encode_image(image, fmt):
+    pil_format = RENDITION_FORMATS[fmt][0]
+    if image.mode == "I":
+        # 16-bit levels (see transforms.apply_plan); a plain convert to 8 bits
+        # would clip everything above 255 to white
+        if pil_format == "PNG":
+            image = image.convert("I;16")
+        else:
+            image = image.point(lambda value: value / 256).convert("L")
+    if image.mode not in RENDITION_MODES[pil_format]:
+        alpha = pil_format != "JPEG" and "A" in image.getbands()
+        image = image.convert("RGBA" if alpha else "RGB")
+    out = BytesIO()
+    image.save(out, format=pil_format)
+    return out.getvalue()
+
+
 def new_filename(key):
     key_parts = key.split(".")
     return f"{key_parts[0]}_thumbnail.png"
 
+
+def rendition_filename(key, width, height, fit, fmt, preset=None):
+    suffix = f"-{preset}-{PRESET_DIGESTS[preset]}" if preset else ""
+    return f"{RENDITION_PREFIX}{key}/{width}x{height}-{fit}{suffix}.{fmt}"
+
 def upload_thumbnail_to_s3(bucket, thumbnail_key, image, size):
     out_thumbnail = BytesIO()
     image.save(out_thumbnail, format="PNG" )
@@ -43,23 +145,46 @@ def upload_thumbnail_to_s3(bucket, thumbnail_key, image, size):
     )
     print(response)
 
-    url = s3.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": bucket, "Key": thumbnail_key},
-        ExpiresIn=3600
-    )
+    return thumbnail_key
+
+
+def thumbnail_location(item):
+    """(bucket, key) of an item's thumbnail, or None if it has neither."""
+    if 'thumbnail_key' in item:
+        return item['thumbnail_bucket'], item['thumbnail_key']
+    # Items written before URLs were signed on read only kept the presigned
+    # URL, virtual-hosted (bucket.s3[.region].amazonaws.com/key) or path-style
+    url = urllib.parse.urlparse(item.get('thumbnail_url') or '')
+    path = urllib.parse.unquote(url.path.lstrip('/'))
+    host = re.match(r'^(?:(.+)\.)?s3[.-]', url.hostname or '')
+    if not host or not path:
+        return None
+    if host.group(1):
+        return host.group(1), path
+    bucket, _, key = path.partition('/')
+    return (bucket, key) if key else None
 
-    return url
 
+def with_thumbnail_urls(items):
+    located = [(item, thumbnail_location(item)) for item in items]
+    located = [(item, location) for item, location in located if location]
+    urls = signer.sign_batch(location for _, location in located)
+    for (item, _), url in zip(located, urls):
+        item['thumbnail_url'] = url
+    return items
 
-def s3_save_thumbnail_url_to_dynamodb(url_path, img_size):
+
+def s3_save_thumbnail_to_dynamodb(thumbnail_id, bucket, thumbnail_key, img_size, image_hash, placeholder):
     toint = Decimal(str((img_size*0.53)/1000))
     table = dynamodb.Table(dbtable)
     response = table.put_item(
         Item={
-            'id': str(uuid.uuid4()),
-            'thumbnail_url': url_path,
+            'id': thumbnail_id,
+            'thumbnail_bucket': bucket,
+            'thumbnail_key': thumbnail_key,
             'approx_size_kb': toint,
+            'dhash': image_hash,
+            'placeholder': placeholder,
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
         }
@@ -70,26 +195,118 @@ def s3_save_thumbnail_url_to_dynamodb(url_path, img_size):
         'body': json.dumps(response)
     }
 
-def s3_thumbnail_generator(event, context):
-    #parce the S3 event
-    print("Event: ", event)
-    bucket = event["Records"][0]["s3"]["bucket"]['name']
-    key = urllib.parse.unquote_plus(event["Records"][0]["s3"]["object"]["key"])
-    size = event["Records"][0]["s3"]["object"]['size']
+def process_s3_record(record):
+    bucket = record["s3"]["bucket"]['name']
+    key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
+    size = record["s3"]["object"]['size']
 
-    if(not key.endswith("_thumbnail.png")):
+    if(not key.endswith("_thumbnail.png") and not key.startswith(DERIVED_PREFIXES)):
         image = get_S3_image(bucket, key)
 
         thumbnail = image_to_thumbnail(image)
 
+        image_hash = phash.dhash(thumbnail)
+
+        placeholder = image_placeholder(thumbnail)
+
         thumbnail_key = new_filename(key)
 
-        url = upload_thumbnail_to_s3(bucket, thumbnail_key,thumbnail, size)
+        upload_thumbnail_to_s3(bucket, thumbnail_key,thumbnail, size)
 
-        response = s3_save_thumbnail_url_to_dynamodb(url, size)
+        thumbnail_id = str(uuid.uuid4())
+        response = s3_save_thumbnail_to_dynamodb(thumbnail_id, bucket, thumbnail_key, size, image_hash, placeholder)
+        hash_store.record(s3, bucket_name, thumbnail_id, image_hash)
 
         return response
-    
+
+def s3_thumbnail_generator(event, context):
+    #parce the S3 event
+    print("Event: ", event)
+    return process_s3_record(event["Records"][0])
+
+def process_sqs_message(message):
+    # Each message body is an S3 event notification; the s3:TestEvent sent
+    # when the notification is first configured has no Records and is dropped
+    for record in json.loads(message["body"]).get("Records", []):
+        process_s3_record(record)
+
+def s3_thumbnail_worker(event, context):
+    messages = event["Records"]
+    print(f"Received {len(messages)} messages")
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, min(WORKER_CONCURRENCY, len(messages)))) as pool:
+        futures = {pool.submit(process_sqs_message, message): message["messageId"] for message in messages}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to process message {futures[future]}: {e}")
+                failures.append({"itemIdentifier": futures[future]})
+    # Only the failed messages become visible again and are redelivered
+    return {"batchItemFailures": failures}
+
+def s3_render_image(event, context):
+    # {key+} path parameters are percent-encoded; "+" is a literal plus here,
+    # unlike in S3 event keys
+    key = urllib.parse.unquote(event["pathParameters"]["key"])
+    params = event.get("queryStringParameters") or {}
+    fit = params.get("fit", "cover")
+    fmt = params.get("fmt", "png").lower()
+    preset = params.get("preset")
+    try:
+        width, height = int(params.get("w", 0)), int(params.get("h", 0))
+    except ValueError:
+        width, height = 0, 0
+
+    if ((width, height) not in RENDITION_SIZES or fit not in RENDITION_FITS or fmt not in RENDITION_FORMATS
+            or (preset is not None and preset not in TRANSFORM_PRESETS)):
+        allowed = sorted(f"{w}x{h}" for w, h in RENDITION_SIZES)
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({
+                'message': 'Unsupported rendition',
+                'sizes': allowed,
+                'fits': list(RENDITION_FITS),
+                'formats': list(RENDITION_FORMATS),
+                'presets': sorted(TRANSFORM_PRESETS)
+            })
+        }
+
+    rendition_key = rendition_filename(key, width, height, fit, fmt, preset)
+    content_type = RENDITION_FORMATS[fmt][1]
+    try:
+        body = s3.get_object(Bucket=bucket_name, Key=rendition_key)["Body"].read()
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+        try:
+            image = get_S3_image(bucket_name, key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchKey":
+                raise
+            return {
+                'statusCode': 404,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'message': f'Image {key} not found.'})
+            }
+        rendition = transform_image(image, TRANSFORM_PRESETS.get(preset, []), width, height, fit)
+        body = encode_image(rendition, fmt)
+        s3.put_object(
+            Body = body,
+            Bucket = bucket_name,
+            ContentType = content_type,
+            CacheControl = RENDITION_CACHE_CONTROL,
+            Key = rendition_key
+        )
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': content_type, 'Cache-Control': RENDITION_CACHE_CONTROL},
+        'body': base64.b64encode(body).decode("ascii"),
+        'isBase64Encoded': True
+    }
+
 # ====== RD - (no Create), Update, Delete functions needed for this use case) ======
 def s3_get_thumbnails(event, context):
     table = dynamodb.Table(dbtable)
@@ -103,7 +320,7 @@ def s3_get_thumbnails(event, context):
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'application/json'},
-        'body': json.dumps(items , cls=DecimalEncoder)
+        'body': json.dumps(with_thumbnail_urls(items) , cls=DecimalEncoder)
     }
 
 def s3_get_thumbnail_by_id(event, context):
@@ -114,13 +331,198 @@ def s3_get_thumbnail_by_id(event, context):
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'application/json'},
-        'body': json.dumps(item, cls=DecimalEncoder)
+        'body': json.dumps(with_thumbnail_urls([item])[0], cls=DecimalEncoder)
+    }
+
+def scan_hashes():
+    """(ids, hashes) of every item with a dhash, read with a parallel scan."""
+    table = dynamodb.Table(dbtable)
+
+    def scan_segment(segment):
+        scan_kwargs = {
+            'ProjectionExpression': 'id, dhash',
+            'FilterExpression': 'attribute_exists(dhash)',
+            'Segment': segment,
+            'TotalSegments': HASH_SCAN_SEGMENTS
+        }
+        items = []
+        while True:
+            response = table.scan(**scan_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=HASH_SCAN_SEGMENTS) as pool:
+        items = [item for segment in pool.map(scan_segment, range(HASH_SCAN_SEGMENTS)) for item in segment]
+    return [item['id'] for item in items], [int(item['dhash']) for item in items]
+
+def load_hash_index():
+    global _hash_index, _hash_index_loaded_at, _hash_base
+    if _hash_index is not None and time.monotonic() - _hash_index_loaded_at < HASH_INDEX_TTL:
+        return _hash_index
+
+    base = hash_store.load_base(s3, bucket_name, _hash_base[0] if _hash_base else None)
+    if base == "unchanged":
+        base = _hash_base
+    if base is None:
+        # Not compacted yet; the table already reflects every pending record
+        ids, hashes = scan_hashes()
+    else:
+        _hash_base = base
+        keys = hash_store.pending_keys(s3, bucket_name)
+        ids, hashes = hash_store.apply_pending(base[1], base[2], hash_store.load_pending(s3, bucket_name, keys))
+
+    _hash_index = phash.HashIndex(ids, hashes)
+    _hash_index_loaded_at = time.monotonic()
+    print(f"Loaded {len(_hash_index)} perceptual hashes")
+    return _hash_index
+
+def s3_compact_hash_index(event, context):
+    """Fold pending hash records into a new base index; {"rebuild": true} rescans the table."""
+    # Listed first: each record is written after its table write, so a scan
+    # started afterwards already covers everything listed
+    keys = hash_store.pending_keys(s3, bucket_name)
+    base = None if (event or {}).get("rebuild") else hash_store.load_base(s3, bucket_name)
+    if base is None:
+        ids, hashes = scan_hashes()
+    else:
+        ids, hashes = hash_store.apply_pending(base[1], base[2], hash_store.load_pending(s3, bucket_name, keys))
+    hash_store.save_base(s3, bucket_name, ids, hashes)
+    hash_store.delete_pending(s3, bucket_name, keys)
+    print(f"Hash index: {len(ids)} hashes, {len(keys)} pending records compacted")
+    return {'hashes': len(ids), 'compacted': len(keys)}
+
+def s3_get_similar_thumbnails(event, context):
+    thumbnail_id = event['pathParameters']['id']
+    params = event.get('queryStringParameters') or {}
+    try:
+        max_distance = int(params.get('distance', 10))
+        limit = int(params.get('limit', 50))
+    except ValueError:
+        max_distance = limit = None
+    if max_distance is None or not 0 <= max_distance <= 64 or not 1 <= limit <= MAX_SIMILAR_LIMIT:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'message': f'distance must be an integer from 0 to 64 and limit from 1 to {MAX_SIMILAR_LIMIT}.'})
+        }
+
+    index = load_hash_index()
+    image_hash = index.hash_of(thumbnail_id)
+    if image_hash is None:
+        item = dynamodb.Table(dbtable).get_item(Key={'id': thumbnail_id}).get('Item', {})
+        if 'dhash' not in item:
+            return {
+                'statusCode': 404,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps({'message': f'No perceptual hash for thumbnail {thumbnail_id}.'})
+            }
+        image_hash = int(item['dhash'])
+
+    matches = [
+        {'id': match_id, 'distance': distance}
+        for match_id, distance in index.query(image_hash, max_distance, limit + 1)
+        if match_id != thumbnail_id
+    ][:limit]
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps({'id': thumbnail_id, 'matches': matches})
+    }
+
+def get_thumbnail_items(ids):
+    items = []
+    for start in range(0, len(ids), 100):
+        request = {dbtable: {
+            'Keys': [{'id': thumbnail_id} for thumbnail_id in ids[start:start + 100]],
+            'ProjectionExpression': 'id, thumbnail_bucket, thumbnail_key, thumbnail_url'
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response['Responses'].get(dbtable, []))
+            request = response.get('UnprocessedKeys')
+    return items
+
+def s3_get_thumbnail_sprite(event, context):
+    params = event.get('queryStringParameters') or {}
+    ids = sorted({i.strip() for i in params.get('ids', '').split(',') if i.strip()})
+    if not ids or len(ids) > SPRITE_MAX_IDS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'message': f'ids must list between 1 and {SPRITE_MAX_IDS} thumbnail ids.'})
+        }
+
+    sprite_key, map_key = sprite_filenames(ids)
+    try:
+        sprite_map = json.loads(s3.get_object(Bucket=bucket_name, Key=map_key)["Body"].read())
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+        items = [item for item in get_thumbnail_items(ids) if thumbnail_location(item)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            images = list(pool.map(lambda item: get_S3_image(*thumbnail_location(item)), items))
+        tiles = sorted(zip((item['id'] for item in items), images))
+        sprite, coordinates = compose_sprite(tiles, size)
+        missing = [thumbnail_id for thumbnail_id in ids if thumbnail_id not in coordinates]
+
+        out_sprite = BytesIO()
+        sprite.save(out_sprite, format="PNG")
+        s3.put_object(
+            Body = out_sprite.getvalue(),
+            Bucket = bucket_name,
+            ContentType = "image/png",
+            # Recomposed once the missing thumbnails exist, so not immutable
+            CacheControl = SPRITE_INCOMPLETE_CACHE_CONTROL if missing else RENDITION_CACHE_CONTROL,
+            Key = sprite_key
+        )
+        sprite_map = {
+            'width': sprite.width,
+            'height': sprite.height,
+            'tiles': coordinates,
+            'missing': missing
+        }
+        # Only complete sprites are cached: thumbnails that arrive later would
+        # never be added to a cached map. The map is written last so its
+        # presence means the sprite is complete.
+        if not missing:
+            s3.put_object(
+                Body = json.dumps(sprite_map).encode("utf-8"),
+                Bucket = bucket_name,
+                ContentType = "application/json",
+                Key = map_key
+            )
+
+    sprite_map['sprite_url'] = signer.sign(bucket_name, sprite_key)
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(sprite_map)
+    }
+
+def s3_sign_thumbnail_urls(event, context):
+    params = event.get('queryStringParameters') or {}
+    ids = sorted({i.strip() for i in params.get('ids', '').split(',') if i.strip()})
+    if not ids:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'message': 'ids must list at least one thumbnail id.'})
+        }
+
+    items = with_thumbnail_urls(get_thumbnail_items(ids))
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps({item['id']: item['thumbnail_url'] for item in items if 'thumbnail_url' in item})
     }
 
 def s3_delete_thumbnail_by_id(event, context):
     table = dynamodb.Table(dbtable)
     thumbnail_id = event['pathParameters']['id']
     response = table.delete_item(Key={'id': thumbnail_id})
+    hash_store.record_deletion(s3, bucket_name, thumbnail_id)
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'application/json'},
@@ -131,7 +533,9 @@ def s3_delete_thumbnail_by_id(event, context):
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
-            # Convert to float or int depending on your needs
+            # Integral values stay ints so 64-bit hashes keep full precision
+            if obj == obj.to_integral_value():
+                return int(obj)
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
 
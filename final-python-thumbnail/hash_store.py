@@ -0,0 +1,114 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+
+# Perceptual-hash index persisted in the bucket, so a container loads one
+# packed object instead of scanning the metadata table. The base object is an
+# .npz of two arrays (ids, uint64 hashes). Every new or deleted thumbnail adds
+# a small pending record; readers apply pending records over the base, and the
+# compaction function folds them into a new base and deletes them.
+
+HASH_INDEX_PREFIX = "hash-index/"
+BASE_KEY = f"{HASH_INDEX_PREFIX}index.npz"
+PENDING_PREFIX = f"{HASH_INDEX_PREFIX}pending/"
+FETCH_WORKERS = 16
+
+
+def dumps(ids, hashes):
+    out = BytesIO()
+    # Ids are ASCII uuids; bytes take a quarter of the space of numpy str
+    np.savez(out, ids=np.array([item_id.encode("ascii") for item_id in ids], dtype=bytes),
+             hashes=np.asarray(hashes, dtype=np.uint64))
+    return out.getvalue()
+
+
+def loads(body):
+    with np.load(BytesIO(body), allow_pickle=False) as data:
+        return data["ids"].astype(str).tolist(), data["hashes"]
+
+
+def _record(s3, bucket, item_id, entry):
+    # Keys sort in write order, so pending records are applied oldest first
+    key = f"{PENDING_PREFIX}{time.time_ns():020d}-{item_id}.json"
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(entry).encode("utf-8"),
+                  ContentType="application/json")
+
+
+def record(s3, bucket, item_id, value):
+    _record(s3, bucket, item_id, {"id": item_id, "dhash": str(value)})
+
+
+def record_deletion(s3, bucket, item_id):
+    _record(s3, bucket, item_id, {"id": item_id, "deleted": True})
+
+
+def load_base(s3, bucket, etag=None):
+    """(etag, ids, hashes) of the base index; None if there is none, "unchanged" on a 304."""
+    kwargs = {"Bucket": bucket, "Key": BASE_KEY}
+    if etag:
+        kwargs["IfNoneMatch"] = etag
+    try:
+        response = s3.get_object(**kwargs)
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code in ("304", "NotModified"):
+            return "unchanged"
+        if code == "NoSuchKey":
+            return None
+        raise
+    return (response["ETag"], *loads(response["Body"].read()))
+
+
+def save_base(s3, bucket, ids, hashes):
+    s3.put_object(Bucket=bucket, Key=BASE_KEY, Body=dumps(ids, hashes), ContentType="application/octet-stream")
+
+
+def pending_keys(s3, bucket):
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=PENDING_PREFIX):
+        keys.extend(entry["Key"] for entry in page.get("Contents", []))
+    return sorted(keys)
+
+
+def load_pending(s3, bucket, keys):
+    def fetch(key):
+        try:
+            return json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+        except ClientError as e:
+            # Compacted (and deleted) since it was listed; the base has it now
+            if e.response["Error"]["Code"] != "NoSuchKey":
+                raise
+            return None
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        return [entry for entry in pool.map(fetch, keys) if entry is not None]
+
+
+def apply_pending(ids, hashes, entries):
+    """Base arrays with pending records applied, oldest first."""
+    if not entries:
+        return ids, hashes
+    latest = {}
+    for entry in entries:
+        latest[entry["id"]] = entry
+    keep = np.fromiter((item_id not in latest for item_id in ids), dtype=bool, count=len(ids))
+    added = [entry for entry in latest.values() if not entry.get("deleted")]
+    merged_ids = [item_id for item_id, kept in zip(ids, keep) if kept] + [entry["id"] for entry in added]
+    merged_hashes = np.concatenate([
+        np.asarray(hashes, dtype=np.uint64)[keep],
+        np.fromiter((int(entry["dhash"]) for entry in added), dtype=np.uint64, count=len(added)),
+    ])
+    return merged_ids, merged_hashes
+
+
+def delete_pending(s3, bucket, keys):
+    for start in range(0, len(keys), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={
+            "Objects": [{"Key": key} for key in keys[start:start + 1000]],
+            "Quiet": True,
+        })
@@ -0,0 +1,127 @@
+import json
+import uuid
+from collections import deque
+from io import BytesIO
+
+from botocore.exceptions import ClientError
+
+
+# In-memory stand-ins for the AWS clients used by handler.py so the pipeline
+# can run locally (benchmarks, offline runs) without touching a real account.
+
+class InMemoryS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, **kwargs):
+        data = Body.read() if hasattr(Body, "read") else bytes(Body)
+        self.objects[(Bucket, Key)] = {"Body": data, "ContentType": ContentType}
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}, "ETag": f'"{len(data):x}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": f"{Key} does not exist"}},
+                "GetObject"
+            )
+        return {
+            "Body": BytesIO(obj["Body"]),
+            "ContentLength": len(obj["Body"]),
+            "ContentType": obj["ContentType"],
+        }
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600):
+        return f"https://{Params['Bucket']}.s3.local/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+    def object_size(self, bucket, key):
+        return len(self.objects[(bucket, key)]["Body"])
+
+
+class InMemoryTable:
+    def __init__(self, name):
+        self.name = name
+        self.items = {}
+
+    def put_item(self, Item, **kwargs):
+        self.items[Item["id"]] = dict(Item)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(Key["id"])
+        return {"Item": dict(item)} if item else {}
+
+    def delete_item(self, Key, **kwargs):
+        self.items.pop(Key["id"], None)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def scan(self, **kwargs):
+        return {"Items": [dict(item) for item in self.items.values()]}
+
+
+class InMemoryDynamoDB:
+    def __init__(self):
+        self.tables = {}
+
+    def Table(self, name):
+        return self.tables.setdefault(name, InMemoryTable(name))
+
+    def batch_get_item(self, RequestItems):
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            responses[name] = [dict(table.items[k["id"]]) for k in request["Keys"] if k["id"] in table.items]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+
+class InMemoryQueue:
+    """SQS stand-in that hands out batches shaped like Lambda SQS events."""
+
+    def __init__(self, max_receive_count=3):
+        self.max_receive_count = max_receive_count
+        self.messages = deque()
+        self.dead_letters = []
+
+    def send_message(self, MessageBody, **kwargs):
+        message_id = str(uuid.uuid4())
+        self.messages.append({"messageId": message_id, "body": MessageBody, "receiveCount": 0})
+        return {"MessageId": message_id}
+
+    def send_s3_event(self, bucket, key, size):
+        """Enqueue the notification S3 would send for a new object."""
+        record = {
+            "eventSource": "aws:s3",
+            "eventName": "ObjectCreated:Put",
+            "s3": {"bucket": {"name": bucket}, "object": {"key": key, "size": size}},
+        }
+        return self.send_message(json.dumps({"Records": [record]}))
+
+    def receive_batch(self, batch_size=10):
+        batch = []
+        while self.messages and len(batch) < batch_size:
+            message = self.messages.popleft()
+            message["receiveCount"] += 1
+            batch.append(message)
+        return batch
+
+    def drain(self, handler, batch_size=10):
+        """Feed batches to handler until the queue is empty, honouring batchItemFailures."""
+        while self.messages:
+            batch = self.receive_batch(batch_size)
+            event = {"Records": [
+                {
+                    "messageId": m["messageId"],
+                    "body": m["body"],
+                    "eventSource": "aws:sqs",
+                    "attributes": {"ApproximateReceiveCount": str(m["receiveCount"])},
+                }
+                for m in batch
+            ]}
+            failed = {f["itemIdentifier"] for f in handler(event, None).get("batchItemFailures", [])}
+            for message in batch:
+                if message["messageId"] not in failed:
+                    continue
+                if message["receiveCount"] >= self.max_receive_count:
+                    self.dead_letters.append(message)
+                else:
+                    self.messages.append(message)
@@ -0,0 +1,47 @@
+"""Run the queue worker locally against in-memory S3, DynamoDB and SQS.
+
+    python local_worker.py photo1.png photo2.png --batch-size 10
+"""
+import argparse
+import json
+import os
+
+os.environ.setdefault("THUMBNAIL_SIZE", "128")
+os.environ.setdefault("DYNAMODB_TABLE", "local-thumbnail-table")
+os.environ.setdefault("REGION_NAME", "ap-south-1")
+os.environ.setdefault("THUMBNAIL_BUCKET", "local-bucket")
+
+import handler  # noqa: E402
+from local_aws import InMemoryDynamoDB, InMemoryQueue, InMemoryS3  # noqa: E402
+from signer import UrlSigner  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--max-receive-count", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    handler.s3 = InMemoryS3()
+    handler.dynamodb = InMemoryDynamoDB()
+    handler.signer = UrlSigner(handler.s3)
+    queue = InMemoryQueue(max_receive_count=args.max_receive_count)
+
+    for path in args.images:
+        key = os.path.basename(path)
+        with open(path, "rb") as f:
+            body = f.read()
+        handler.s3.put_object(Bucket=handler.bucket_name, Key=key, Body=body)
+        queue.send_s3_event(handler.bucket_name, key, len(body))
+
+    queue.drain(handler.s3_thumbnail_worker, batch_size=args.batch_size)
+
+    items = handler.dynamodb.Table(handler.dbtable).items.values()
+    print(json.dumps(handler.with_thumbnail_urls(list(items)), cls=handler.DecimalEncoder, indent=2))
+    for message in queue.dead_letters:
+        print(f"Dead-lettered after {message['receiveCount']} attempts: {message['body']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import numpy as np
+from PIL import Image
+
+
+# Perceptual hashing for near-duplicate detection. Hashes are 64-bit
+# difference hashes (dHash) so a whole index fits in one uint64 array and a
+# lookup is a vectorized XOR + popcount over that array.
+
+HASH_SIZE = 8
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image):
+    """Return the 64-bit dHash of an image as a Python int."""
+    grid = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(grid, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def popcount(values):
+    """Count set bits of every element of a uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class HashIndex:
+    def __init__(self, ids, hashes):
+        self.ids = list(ids)
+        if isinstance(hashes, np.ndarray):
+            self.hashes = hashes.astype(np.uint64, copy=False)
+        else:
+            self.hashes = np.fromiter((int(h) for h in hashes), dtype=np.uint64, count=len(self.ids))
+        self.positions = {item_id: i for i, item_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def hash_of(self, item_id):
+        position = self.positions.get(item_id)
+        return None if position is None else int(self.hashes[position])
+
+    def query(self, value, max_distance, limit=None):
+        """Return (id, distance) pairs within max_distance bits, closest first."""
+        distances = popcount(np.bitwise_xor(self.hashes, np.uint64(value)))
+        matches = np.flatnonzero(distances <= max_distance)
+        matches = matches[np.argsort(distances[matches], kind="stable")]
+        if limit is not None:
+            matches = matches[:limit]
+        return [(self.ids[i], int(distances[i])) for i in matches]
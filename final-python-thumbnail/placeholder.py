@@ -0,0 +1,25 @@
+import base64
+from io import BytesIO
+from PIL import Image, features
+
+
+# Low-quality image placeholders: a few-pixel preview of the thumbnail small
+# enough to be inlined in the metadata item and rendered (blurred) by the
+# client while the real thumbnail loads.
+
+PLACEHOLDER_SIZE = 8
+
+
+def image_placeholder(image, size=PLACEHOLDER_SIZE):
+    """Return a base64 data URI of the image shrunk to at most size x size."""
+    preview = image.convert("RGB")
+    preview.thumbnail((size, size), Image.Resampling.BOX)
+
+    out = BytesIO()
+    if features.check("webp"):
+        preview.save(out, format="WEBP", quality=40)
+        mime = "image/webp"
+    else:
+        preview.save(out, format="PNG", optimize=True)
+        mime = "image/png"
+    return f"data:{mime};base64,{base64.b64encode(out.getvalue()).decode('ascii')}"
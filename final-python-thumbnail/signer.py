@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+# Presigned URLs are minted when items are read instead of being stored, so
+# they never go stale in the table. Signatures are memoized per (bucket, key)
+# for one time window: every URL is signed for two windows, so a URL handed
+# out anywhere inside a window stays valid for at least one full window.
+
+class UrlSigner:
+    def __init__(self, client, window_seconds=900, clock=time.time):
+        self.client = client
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._window = None
+        self._urls = {}
+
+    def _current_cache(self):
+        window = int(self.clock() // self.window_seconds)
+        with self._lock:
+            if window != self._window:
+                # Old signatures are never served again, so drop them wholesale
+                self._window = window
+                self._urls = {}
+            return self._urls
+
+    def _presign(self, bucket, key):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": bucket, "Key": key},
+            ExpiresIn=2 * self.window_seconds
+        )
+
+    def sign(self, bucket, key):
+        return self.sign_batch([(bucket, key)])[0]
+
+    def sign_batch(self, locations):
+        """Sign an iterable of (bucket, key) pairs, returning URLs in the same order."""
+        urls = self._current_cache()
+        signed = []
+        for location in locations:
+            url = urls.get(location)
+            if url is None:
+                url = urls[location] = self._presign(*location)
+            signed.append(url)
+        return signed
@@ -0,0 +1,41 @@
+import hashlib
+import math
+from PIL import Image
+
+
+# Sprite sheets: many thumbnails packed into one image plus a coordinate map,
+# so a gallery grid costs a single image request.
+
+SPRITE_PREFIX = "sprites/"
+
+
+def sprite_digest(ids):
+    """Stable cache id for a set of thumbnail ids, independent of order and repeats."""
+    joined = "\n".join(sorted(set(ids)))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:32]
+
+
+def sprite_filenames(ids):
+    digest = sprite_digest(ids)
+    return f"{SPRITE_PREFIX}{digest}.png", f"{SPRITE_PREFIX}{digest}.json"
+
+
+def compose_sprite(tiles, tile_size):
+    """Paste (id, image) tiles onto a square-ish grid.
+
+    Returns the sprite image and a map of id -> {x, y, w, h} in sprite pixels.
+    """
+    columns = max(1, math.ceil(math.sqrt(len(tiles))))
+    rows = max(1, math.ceil(len(tiles) / columns))
+    sprite = Image.new("RGBA", (columns * tile_size, rows * tile_size), (0, 0, 0, 0))
+
+    coordinates = {}
+    for position, (tile_id, tile) in enumerate(tiles):
+        if tile.width > tile_size or tile.height > tile_size:
+            tile = tile.copy()
+            tile.thumbnail((tile_size, tile_size), Image.Resampling.LANCZOS)
+        x = (position % columns) * tile_size
+        y = (position // columns) * tile_size
+        sprite.paste(tile, (x, y))
+        coordinates[tile_id] = {"x": x, "y": y, "w": tile.width, "h": tile.height}
+    return sprite, coordinates
@@ -0,0 +1,52 @@
+import os
+import sys
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageStat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("THUMBNAIL_SIZE", "128")
+os.environ.setdefault("DYNAMODB_TABLE", "thumbnails-test")
+os.environ.setdefault("REGION_NAME", "ap-south-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-south-1")
+
+import handler  # noqa: E402
+import transforms  # noqa: E402
+
+
+def sixteen_bit_png(width=300, height=200):
+    """A 16-bit grayscale PNG, opened lazily the way get_S3_image returns it."""
+    # A horizontal ramp over the full 16-bit range
+    image = Image.new("I", (width, height))
+    image.putdata([x * 65535 // (width - 1) for _ in range(height) for x in range(width)])
+    out = BytesIO()
+    image.convert("I;16").save(out, format="PNG")
+    source = Image.open(BytesIO(out.getvalue()))
+    assert source.mode == "I;16"
+    return source
+
+
+@pytest.mark.parametrize("spec", ["", "crop:0.1,0.1,0.9,0.9;grayscale"])
+@pytest.mark.parametrize("fmt", ["png", "jpeg", "webp"])
+def test_sixteen_bit_png_renders(spec, fmt):
+    rendition = handler.transform_image(sixteen_bit_png(), transforms.parse_spec(spec), 64, 64, "cover")
+    result = Image.open(BytesIO(handler.encode_image(rendition, fmt)))
+
+    assert result.size == (64, 64)
+    if result.mode.startswith("I"):
+        # PNG keeps all 16 bits (ImageStat bins these into 8-bit levels)
+        low, high = result.getextrema()
+        mean = (low + high) / 2 / 256
+    else:
+        # Scaled down to 8 bits rather than clipped to white
+        mean = ImageStat.Stat(result.convert("L")).mean[0]
+    assert 64 < mean < 192
+
+
+def test_optimized_plan_downscales_sixteen_bit_source():
+    ops = transforms.parse_spec("resize:64x64:contain")
+    image, report = transforms.transform(sixteen_bit_png(), ops)
+
+    assert report["plan"] == ["decode", "scale", "resize"]
+    assert image.size == (64, 43)
@@ -0,0 +1,302 @@
+import json
+import math
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
+
+
+# Declarative image transforms. A spec is a list of ops, e.g.
+#
+#   [{"op": "crop", "box": [0.1, 0.1, 0.9, 0.9]}, {"op": "grayscale"},
+#    {"op": "resize", "width": 256, "height": 256, "fit": "cover"},
+#    {"op": "sharpen", "percent": 120}, {"op": "watermark", "text": "(c) me"}]
+#
+# or the same thing in compact form:
+#
+#   crop:0.1,0.1,0.9,0.9;grayscale;resize:256x256:cover;sharpen:120;watermark:(c) me
+#
+# Crop boxes are fractions of the current image, so crops, rotations and
+# grayscale all commute with uniform scaling. optimize() uses that to move the
+# downscale in front of them (into the JPEG decoder itself where possible),
+# fuses the first crop into the resample and merges adjacent crops and
+# quarter-turn rotations, so only the decode allocates a full-resolution buffer.
+# sharpen and watermark depend on pixel scale and are never reordered.
+
+OPS = ("crop", "rotate", "grayscale", "sharpen", "watermark", "resize")
+SCALE_INVARIANT_OPS = ("crop", "rotate", "grayscale")
+FITS = ("cover", "contain")
+BYTES_PER_PIXEL = {"1": 1, "L": 1, "P": 1, "LA": 4, "RGB": 4, "RGBA": 4, "CMYK": 4, "I": 4, "F": 4}
+# Pillow's JPEG decoder can scale by 1/2, 1/4 and 1/8 while decoding
+JPEG_DRAFT_SCALES = (8, 4, 2, 1)
+
+
+def parse_spec(value):
+    """Parse a JSON list or compact spec string into a validated list of ops."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            value = json.loads(value)
+        else:
+            value = [_parse_compact(part) for part in value.split(";") if part.strip()]
+    return [_validate(dict(op)) for op in value]
+
+
+def _parse_compact(part):
+    name, _, args = part.strip().partition(":")
+    if name == "crop":
+        return {"op": "crop", "box": [float(n) for n in args.split(",")]}
+    if name == "rotate":
+        return {"op": "rotate", "degrees": float(args)}
+    if name == "grayscale":
+        return {"op": "grayscale"}
+    if name == "sharpen":
+        return {"op": "sharpen", "percent": int(args or 100)}
+    if name == "watermark":
+        return {"op": "watermark", "text": args}
+    if name == "resize":
+        dims, _, fit = args.partition(":")
+        width, height = (int(n) for n in dims.lower().split("x"))
+        return {"op": "resize", "width": width, "height": height, "fit": fit or "cover"}
+    raise ValueError(f"Unknown transform {name!r}")
+
+
+def _validate(op):
+    if op.get("op") not in OPS:
+        raise ValueError(f"Unknown transform {op.get('op')!r}")
+    if op["op"] == "crop":
+        left, top, right, bottom = (float(n) for n in op["box"])
+        if not 0 <= left < right <= 1 or not 0 <= top < bottom <= 1:
+            raise ValueError("crop box must be fractions with left < right and top < bottom")
+        op["box"] = [left, top, right, bottom]
+    elif op["op"] == "rotate":
+        op["degrees"] = float(op["degrees"]) % 360
+    elif op["op"] == "resize":
+        if op.get("fit", "cover") not in FITS or int(op["width"]) <= 0 or int(op["height"]) <= 0:
+            raise ValueError("resize needs positive width/height and fit cover or contain")
+        op["width"], op["height"], op["fit"] = int(op["width"]), int(op["height"]), op.get("fit", "cover")
+    return op
+
+
+def _merge_adjacent(ops):
+    merged = []
+    for op in ops:
+        previous = merged[-1] if merged else None
+        if previous and previous["op"] == op["op"] == "crop":
+            l1, t1, r1, b1 = previous["box"]
+            l2, t2, r2, b2 = op["box"]
+            w, h = r1 - l1, b1 - t1
+            merged[-1] = {"op": "crop", "box": [l1 + l2 * w, t1 + t2 * h, l1 + r2 * w, t1 + b2 * h]}
+        elif (
+            previous and previous["op"] == op["op"] == "rotate"
+            and previous["degrees"] % 90 == op["degrees"] % 90 == 0
+        ):
+            # Only quarter turns compose; other angles expand the canvas each time
+            merged[-1] = {"op": "rotate", "degrees": (previous["degrees"] + op["degrees"]) % 360}
+        elif previous and previous["op"] == op["op"] == "grayscale":
+            continue
+        else:
+            merged.append(dict(op))
+    return [op for op in merged if not (op["op"] == "rotate" and op["degrees"] == 0)]
+
+
+def _rotated_size(size, degrees):
+    if degrees % 180 == 0:
+        return size
+    if degrees % 90 == 0:
+        return size[1], size[0]
+    angle = math.radians(degrees)
+    cos, sin = abs(math.cos(angle)), abs(math.sin(angle))
+    return (
+        int(math.ceil(size[0] * cos + size[1] * sin)),
+        int(math.ceil(size[0] * sin + size[1] * cos)),
+    )
+
+
+def _output_size(op, size):
+    """Size of the image produced by op from an input of the given size."""
+    if op["op"] == "crop":
+        left, top, right, bottom = _pixel_box(op["box"], size)
+        return right - left, bottom - top
+    if op["op"] == "rotate":
+        return _rotated_size(size, op["degrees"])
+    if op["op"] == "scale":
+        return tuple(op["size"])
+    if op["op"] == "resize":
+        if op["fit"] == "contain":
+            ratio = min(op["width"] / size[0], op["height"] / size[1])
+            return max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio))
+        return op["width"], op["height"]
+    return size
+
+
+def _pixel_box(box, size):
+    return (
+        int(round(box[0] * size[0])), int(round(box[1] * size[1])),
+        max(int(round(box[2] * size[0])), int(round(box[0] * size[0])) + 1),
+        max(int(round(box[3] * size[1])), int(round(box[1] * size[1])) + 1),
+    )
+
+
+def naive_plan(ops):
+    """The spec executed literally, one Pillow call per op after a full decode."""
+    return [{"op": "decode"}] + [dict(op) for op in ops]
+
+
+def optimize(ops, source_size, source_format=None):
+    """Reorder and fuse ops so the downscale happens as early as possible."""
+    ops = list(ops)
+    resize_at = next((i for i, op in enumerate(ops) if op["op"] == "resize"), None)
+    if resize_at is None:
+        return naive_plan(_merge_adjacent(ops))
+
+    # Only the scale-invariant run directly in front of the resize can swap with it
+    start = resize_at
+    while start > 0 and ops[start - 1]["op"] in SCALE_INVARIANT_OPS:
+        start -= 1
+    prefix = _merge_adjacent(ops[:start])
+    hoistable = _merge_adjacent(ops[start:resize_at])
+    resize = ops[resize_at]
+    suffix = _merge_adjacent(ops[resize_at + 1:])
+
+    size = tuple(source_size)
+    for op in prefix:
+        size = _output_size(op, size)
+    segment_input = size
+    for op in hoistable:
+        size = _output_size(op, size)
+    if resize["fit"] == "contain":
+        ratio = min(resize["width"] / size[0], resize["height"] / size[1])
+    else:
+        ratio = max(resize["width"] / size[0], resize["height"] / size[1])
+    if ratio >= 1:
+        # Upscaling: cheapest as the last geometric step, nothing to hoist
+        return naive_plan(prefix + hoistable + [resize] + suffix)
+
+    # The first crop is fused into the resample as its source box
+    box = [0.0, 0.0, 1.0, 1.0]
+    if hoistable and hoistable[0]["op"] == "crop":
+        box = hoistable.pop(0)["box"]
+    grayscale = any(op["op"] == "grayscale" for op in hoistable)
+    hoistable = [op for op in hoistable if op["op"] != "grayscale"]
+
+    scaled = (
+        max(1, int(math.ceil(segment_input[0] * (box[2] - box[0]) * ratio))),
+        max(1, int(math.ceil(segment_input[1] * (box[3] - box[1]) * ratio))),
+    )
+    decode = {"op": "decode"}
+    if not prefix and source_format == "JPEG":
+        # Let libjpeg decode straight to (at least) the size we need
+        decode["draft"] = [
+            int(math.ceil(source_size[0] * ratio)),
+            int(math.ceil(source_size[1] * ratio)),
+        ]
+        if grayscale:
+            decode["mode"] = "L"
+    plan = [decode] + prefix + [{"op": "scale", "size": list(scaled), "box": box}]
+    if grayscale:
+        plan.append({"op": "grayscale"})
+    return plan + hoistable + [dict(resize)] + suffix
+
+
+def _decoded_size(step, source_size):
+    if "draft" not in step:
+        return tuple(source_size)
+    for scale in JPEG_DRAFT_SCALES:
+        if source_size[0] // scale >= step["draft"][0] and source_size[1] // scale >= step["draft"][1]:
+            return -(-source_size[0] // scale), -(-source_size[1] // scale)
+    return tuple(source_size)
+
+
+def estimate_peak_bytes(plan, source_size, source_mode="RGB"):
+    """Largest input+output pixel-buffer footprint of any single step."""
+    size = tuple(source_size)
+    mode = source_mode
+    peak = 0
+    for step in plan:
+        if step["op"] == "decode":
+            size = _decoded_size(step, source_size)
+            mode = step.get("mode", mode)
+            peak = max(peak, size[0] * size[1] * BYTES_PER_PIXEL.get(mode, 4))
+            continue
+        in_bytes = size[0] * size[1] * BYTES_PER_PIXEL.get(mode, 4)
+        if step["op"] == "grayscale":
+            mode = "LA" if "A" in mode else "L"
+        size = _output_size(step, size)
+        out_bytes = size[0] * size[1] * BYTES_PER_PIXEL.get(mode, 4)
+        peak = max(peak, in_bytes + out_bytes)
+    return peak
+
+
+def _watermark(image, text):
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=max(10, image.height // 16))
+    except TypeError:
+        font = ImageFont.load_default()
+    margin = max(2, image.height // 50)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    position = (image.width - (right - left) - margin, image.height - (bottom - top) - margin)
+    light = 255 if image.mode in ("L", "LA") else (255,) * len(image.getbands())
+    dark = 0 if image.mode in ("L", "LA") else (0,) * len(image.getbands())
+    draw.text(position, text, font=font, fill=light, stroke_width=1, stroke_fill=dark)
+    return image
+
+
+_TRANSPOSE = {90: Image.Transpose.ROTATE_90, 180: Image.Transpose.ROTATE_180, 270: Image.Transpose.ROTATE_270}
+
+
+def apply_plan(image, plan):
+    """Execute a plan on a lazily opened image (draft only works before load)."""
+    for step in plan:
+        op = step["op"]
+        if op == "decode":
+            if "draft" in step:
+                image.draft(step.get("mode", image.mode), tuple(step["draft"]))
+            image.load()
+            if image.mode in ("1", "P"):
+                # Palette images would otherwise be resampled with NEAREST
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            elif image.mode.startswith("I;16"):
+                # 16-bit grayscale PNGs; Image.reduce (used by scale) has no
+                # I;16 path, and 32-bit "I" keeps every level
+                image = image.convert("I")
+        elif op == "scale":
+            image = image.resize(
+                tuple(step["size"]), Image.Resampling.LANCZOS,
+                box=_pixel_box(step["box"], image.size), reducing_gap=3.0
+            )
+        elif op == "crop":
+            image = image.crop(_pixel_box(step["box"], image.size))
+        elif op == "rotate":
+            if step["degrees"] in _TRANSPOSE:
+                image = image.transpose(_TRANSPOSE[step["degrees"]])
+            else:
+                image = image.rotate(step["degrees"], Image.Resampling.BICUBIC, expand=True)
+        elif op == "grayscale":
+            if image.mode not in ("L", "LA", "I"):
+                image = image.convert("LA" if "A" in image.getbands() else "L")
+        elif op == "sharpen":
+            image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=step["percent"], threshold=3))
+        elif op == "watermark":
+            image = _watermark(image, step["text"])
+        elif op == "resize":
+            size = (step["width"], step["height"])
+            if step["fit"] == "contain":
+                image = ImageOps.contain(image, size, Image.Resampling.LANCZOS)
+            else:
+                image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    return image
+
+
+def transform(image, ops):
+    """Run ops through the optimizer; returns the result and a memory report."""
+    naive = naive_plan(ops)
+    optimized = optimize(ops, image.size, image.format)
+    report = {
+        "source": f"{image.width}x{image.height} {image.format or ''} {image.mode}".strip(),
+        "naive_peak_bytes": estimate_peak_bytes(naive, image.size, image.mode),
+        "optimized_peak_bytes": estimate_peak_bytes(optimized, image.size, image.mode),
+        "plan": [step["op"] for step in optimized],
+    }
+    return apply_plan(image, optimized), report